@@ -5,8 +5,17 @@ Contains the engines for a Tic-Tac-Toe board
 """
 
 from enum import Enum
-from copy import deepcopy
 
+from bitboard import MaskFromBoard
+from bitboard import CountMask
+from statetable import IsWinnerIndex
+from statetable import IsCatsGameIndex
+from statetable import IsToMoveIndex
+from statetable import EmptyMask
+from symmetry import CanonicalizeIndex
+from instrument import Timed
+
+@Timed
 def IsWinner(board, team):
 	"""
 	Input
@@ -15,46 +24,19 @@ def IsWinner(board, team):
 
 		returns True iff team has won
 	"""
-	for row in range(3):
-		allTeam = True
-		for col in range(3):
-			if board[row][col] != team:
-				allTeam = False
-		if allTeam:
-			return True
-	
-	for col in range(3):
-		allTeam = True
-		for row in range(3):
-			if board[row][col] != team:
-				allTeam = False
-		if allTeam:
-			return True
-
-	allTeam = True
-	for index in range(3):
-		if board[index][index] != team:
-			allTeam = False
-	if allTeam:
-		return True
-
-	return board[0][2] == team and board[1][1] == team and board[2][0] == team
+	return IsWinnerIndex(IndexBoard(board), team)
 
 
 def Count(board, team):
 	"""
 	Counts the number of squares already picked by the team in the board
 	"""
-	count = 0
-	for row in board:
-		for square in row:
-			if square == team:
-				count += 1
-	return count
+	return CountMask(MaskFromBoard(board, team))
 
 
+@Timed
 def IsCatsGame(board):
-	return not IsWinner(board, 'X') and not IsWinner(board, 'O') and Count(board, 'X') == 5
+	return IsCatsGameIndex(IndexBoard(board))
 
 
 class MoveValidation(Enum):
@@ -64,25 +46,25 @@ class MoveValidation(Enum):
 	Occupied = 4
 	NYI = 9
 
+@Timed
 def ValidateMove(board, team, move):
 	"""
 	Validates that the right team is moving, and that the move is into a valid, empty square
 	"""
+	return ValidateMoveForIndex(IndexBoard(board), team, move)
 
-	numX = Count(board, 'X')
-	numO = Count(board, 'O')
-	if team == 'X' and numX != numO:
-		return MoveValidation.WrongTeam
 
-	if team == 'O' and numX != numO+1:
+def ValidateMoveForIndex(index, team, move):
+	"""
+	Same as ValidateMove, for the board with the given index
+	"""
+	if (team == 'X' or team == 'O') and not IsToMoveIndex(index, team):
 		return MoveValidation.WrongTeam
 
 	if move < 0 or move >= 9:
 		return MoveValidation.OutOfRange
 
-	row = move//3
-	col = move%3
-	if board[row][col] != ' ':
+	if not EmptyMask(index) & (1 << move):
 		return MoveValidation.Occupied
 
 	return MoveValidation.Valid
@@ -99,17 +81,17 @@ def Move(board, team, move):
 	board[row][col] = team
 	return
 
+squareValues = {'X': 2, 'O': 1}
+
+@Timed
 def IndexBoard(board):
 	"""
 	Assigns a unique index to the board, using base 3 where blanks are 0, O's are 1, and X's are 2
 	"""
-	def Value(square):
-		return 2 if square=='X' else 1 if square=='O' else 0
-
 	result = 0
 	for row in board:
 		for square in row:
-			result = result*3 + Value(square)
+			result = result*3 + squareValues.get(square, 0)
 	return result
 
 def RotateBoard(board):
@@ -159,31 +141,21 @@ def EqualBoards(left, right):
 	return True
 
 
+@Timed
 def CanonicalizeBoard(boardParam):
 	"""
 	Finds the rotation and reversal of the board that yields the
 	highest index, and uses that as the standard version of the board
 
+	The search is done once for every index up front, in symmetry.py
+
 	returns a tuple of (board, index, rotations, flips)
 	"""
-	indexMax = 0
-	flipsOnMax = 0
-	rotaionsOnMax = 0
-	board = boardParam
-	boardReturn = deepcopy(board)
-	for flips in range(2):
-		for rotations in range(4):
-			index = IndexBoard(board)
-			if index > indexMax:
-				indexMax = index
-				flipsOnMax = flips
-				rotationsOnMax = rotations
-				boardReturn = deepcopy(board)
-			board = RotateBoard(board)
-		board = FlipBoard(board)
-	return (boardReturn, indexMax, rotationsOnMax, flipsOnMax)
+	index, rotations, flips = CanonicalizeIndex(IndexBoard(boardParam))
+	return (BoardFromIndex(index), index, rotations, flips)
 
 
+@Timed
 def BoardFromIndex(index):
 	"""
 	Creates a board from its unique index
@@ -0,0 +1,345 @@
+"""
+batchlearn.py
+
+Learns from a games log in large blocks, straight from its bytes, instead
+of one parsed game at a time. With numpy installed, each block is parsed
+with array operations, and most of its moves go into the matchboxes in a
+single scatter add. Without numpy, or for a store that can't be written
+in bulk, such as a LockedMatchboxStore, the blocks are learned a game at
+a time. Either way the matchboxes end up just as LearnFromParsedGames
+would leave them
+
+numpy parses logs laid out the way Save writes them, one I, M, R, F, W
+or C line at a time, with single spaces. Blocks laid out any other way
+are parsed in Python instead
+"""
+
+from itertools import islice
+
+from matchbox import GetMatchboxes
+from matchbox import defaultBeads
+from matchbox import MatchboxStore
+from matchbox import matchboxIndices
+from matchbox import numRows
+from matchbox import rowsOfIndices
+from matchbox import winBeads
+from matchbox import lossBeads
+from statetable import emptyMasks
+from instrument import Timed
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+# The bytes read from a log, or lines taken from a list, for each block
+blockSize = 1 << 22
+blockLines = 1 << 16
+
+
+class GameBlock:
+	"""
+	The whole games at the start of a block of log bytes, with one entry
+	per move in indices, squares and increments. The moves of cat's games
+	are left out, since nothing is learned from them
+
+	numGames is the number of whole games, cat's games included
+	increments are the beads each move gets, winBeads or -lossBeads
+	moveStarts[game] is where the game's moves start, with numGames + 1
+		entries so the last game's moves end at moveStarts[numGames]
+	size is the number of bytes up to the end of the last whole game
+	"""
+	def __init__(self, numGames, indices, squares, increments, moveStarts, size):
+		self.numGames = numGames
+		self.indices = indices
+		self.squares = squares
+		self.increments = increments
+		self.moveStarts = moveStarts
+		self.size = size
+		return
+
+
+def ParseGameBlockInPython(data):
+	numGames = 0
+	indices = []
+	squares = []
+	increments = []
+	moveStarts = [0]
+	size = 0
+	position = 0
+	moves = []
+	lines = data.split(b'\n')
+	# The last piece has no newline after it, so it is not a whole line
+	for line in lines[:-1]:
+		position += len(line) + 1
+		tokens = line.split()
+		if not tokens:
+			continue
+		if tokens[0] == b'I':
+			index = int(tokens[1])
+		elif tokens[0] == b'M':
+			moves.append((index, tokens[1], int(tokens[2])))
+		elif tokens[0] == b'C' or tokens[0] == b'W':
+			if tokens[0] == b'W':
+				winner = tokens[1]
+				for index, mover, square in moves:
+					indices.append(index)
+					squares.append(square)
+					increments.append(winBeads if mover == winner else -lossBeads)
+			numGames += 1
+			moveStarts.append(len(indices))
+			size = position
+			moves = []
+	return GameBlock(numGames, indices, squares, increments, moveStarts, size)
+
+
+def ParseGameBlockWithNumpy(data):
+	buffer = numpy.frombuffer(data, dtype=numpy.uint8)
+	lineEnds = numpy.flatnonzero(buffer == ord('\n'))
+	lineStarts = numpy.concatenate(([0], lineEnds[:-1] + 1)).astype(numpy.int64)
+	# A blank line starts with its newline, so it is not any kind of line
+	kinds = buffer[lineStarts]
+	if ((kinds == ord(' ')) | (kinds == ord('\t'))).any():
+		raise ValueError('The games log has a line that starts with a space')
+	isEnd = (kinds == ord('W')) | (kinds == ord('C'))
+	endLines = numpy.flatnonzero(isEnd)
+	numGames = len(endLines)
+	if numGames == 0:
+		empty = numpy.zeros(0, dtype=numpy.int64)
+		return GameBlock(0, empty, empty, empty, numpy.zeros(1, dtype=numpy.int64), 0)
+
+	numLines = endLines[-1] + 1
+	size = int(lineEnds[numLines - 1]) + 1
+	lineStarts = lineStarts[:numLines]
+	lineEnds = lineEnds[:numLines]
+	kinds = kinds[:numLines]
+	isEnd = isEnd[:numLines]
+	# Trailing spaces, tabs and carriage returns are not part of a line
+	while True:
+		last = buffer[numpy.maximum(lineEnds - 1, 0)]
+		trailing = (lineEnds > lineStarts) & ((last == ord(' ')) | (last == ord('\t')) | (last == ord('\r')))
+		if not trailing.any():
+			break
+		lineEnds = lineEnds - trailing
+	lengths = lineEnds - lineStarts
+	spaceAfterKind = buffer[numpy.minimum(lineStarts + 1, len(buffer) - 1)] == ord(' ')
+	isMove = kinds == ord('M')
+	if ((kinds == ord('C')) & (lengths != 1)).any() or \
+			((kinds == ord('W')) & ((lengths != 3) | ~spaceAfterKind)).any() or \
+			((kinds == ord('I')) & ~spaceAfterKind).any() or \
+			(isMove & ((lengths != 5) | ~spaceAfterKind | (buffer[numpy.minimum(lineStarts + 3, len(buffer) - 1)] != ord(' ')))).any():
+		raise ValueError('The games log is not laid out as Save writes it')
+	gamesBefore = numpy.cumsum(isEnd) - isEnd
+
+	# 0 for a cat's game, otherwise the winner's letter
+	winners = numpy.where(kinds[endLines] == ord('W'), buffer[numpy.minimum(lineStarts[endLines] + 2, len(buffer) - 1)], 0)
+
+	indexLines = numpy.flatnonzero(kinds == ord('I'))
+	digitStarts = lineStarts[indexLines] + 2
+	numDigits = lineEnds[indexLines] - digitStarts
+	values = numpy.zeros(len(indexLines), dtype=numpy.int64)
+	notDigits = numpy.zeros(len(indexLines), dtype=bool)
+	for digit in range(5):
+		digits = buffer[numpy.minimum(digitStarts + digit, len(buffer) - 1)].astype(numpy.int64) - ord('0')
+		values = numpy.where(numDigits > digit, values*10 + digits, values)
+		notDigits |= (numDigits > digit) & ((digits < 0) | (digits > 9))
+
+	moveLines = numpy.flatnonzero(isMove)
+	# Each move is on the board of the last I line before it
+	whichIndex = numpy.searchsorted(indexLines, moveLines) - 1
+	movers = buffer[numpy.minimum(lineStarts[moveLines] + 2, len(buffer) - 1)]
+	squares = buffer[numpy.minimum(lineStarts[moveLines] + 4, len(buffer) - 1)].astype(numpy.int64) - ord('0')
+	if ((numDigits < 1) | (numDigits > 5)).any() or notDigits.any() or (whichIndex < 0).any() or \
+			((squares < 0) | (squares > 8)).any():
+		raise ValueError('The games log is not laid out as Save writes it')
+
+	moveGames = gamesBefore[moveLines]
+	moveWinners = winners[moveGames]
+	decisive = moveWinners != 0
+	indices = values[whichIndex][decisive]
+	increments = numpy.where(movers[decisive] == moveWinners[decisive], winBeads, -lossBeads)
+	moveStarts = numpy.searchsorted(moveGames[decisive], numpy.arange(numGames + 1))
+	return GameBlock(numGames, indices, squares[decisive], increments, moveStarts, size)
+
+
+def ParseGameBlock(data):
+	"""
+	Parses the whole games at the start of data, which is bytes from a log
+
+	numpy only reads logs laid out exactly as Save writes them. Anything
+	else, such as extra spaces, is parsed again in Python, which reads
+	the lines just as IterParseGames does
+
+	returns the GameBlock
+	"""
+	if numpy is not None:
+		try:
+			return ParseGameBlockWithNumpy(data)
+		except ValueError:
+			pass
+	return ParseGameBlockInPython(data)
+
+
+def LearnGamesOneAtATime(block, games):
+	"""
+	Learns from each of the block's games in turn, exactly as
+	LearnFromParsedGames does. The block has to hold lists, not arrays
+	"""
+	matchboxes = GetMatchboxes()
+	moveStarts = block.moveStarts
+	indices = block.indices
+	squares = block.squares
+	increments = block.increments
+	for game in games:
+		matchboxes.CountGames(1)
+		for move in range(moveStarts[game], moveStarts[game + 1]):
+			if not matchboxes.LearnMove(indices[move], squares[move], increments[move]):
+				break
+	return
+
+
+defaultRows = None
+
+def GetDefaultRows():
+	"""
+	The default matchbox of every row, as a numpy array
+	"""
+	global defaultRows
+	if defaultRows is None:
+		masks = numpy.array(emptyMasks, dtype=numpy.int32)[numpy.array(matchboxIndices)]
+		defaultRows = (((masks[:, None] >> numpy.arange(9)) & 1) * defaultBeads).astype(numpy.int32)
+	return defaultRows
+
+
+def LearnFromGameBlockWithNumpy(block):
+	"""
+	Learning a game stops at the first matchbox that is down to its last
+	bead. Such a matchbox stays that way, since every game that reaches it
+	stops there, so each game is first cut short at the first of them.
+
+	Any other matchbox can only get down to its last bead if the block
+	takes out all but one of its beads, and a square can only run out of
+	beads if the block takes out at least as many as it has. The games
+	that only pass through matchboxes where neither can happen are added
+	in one scatter add. The rest are learned one at a time, in order,
+	which comes out the same, since the games added together never touch
+	the matchboxes they check
+	"""
+	matchboxes = GetMatchboxes()
+	numGames = block.numGames
+	numMoves = len(block.indices)
+	rows = numpy.array(rowsOfIndices, dtype=numpy.int64)[block.indices]
+	if (rows < 0).any():
+		raise KeyError(int(block.indices[numpy.argmax(rows < 0)]))
+
+	beads = numpy.frombuffer(matchboxes.buffer, dtype=numpy.int32, count=numRows*9).reshape(numRows, 9)
+	present = numpy.frombuffer(matchboxes.buffer, dtype=numpy.uint8, count=numRows, offset=MatchboxStore.beadsSize)
+	defaults = GetDefaultRows()
+	totals = numpy.where(present != 0, beads.sum(axis=1), defaults.sum(axis=1))
+	frozen = totals == 1
+
+	gameIds = numpy.repeat(numpy.arange(numGames), numpy.diff(block.moveStarts))
+	positions = numpy.arange(numMoves)
+	firstFrozen = numpy.full(numGames, numMoves)
+	frozenMoves = frozen[rows]
+	numpy.minimum.at(firstFrozen, gameIds[frozenMoves], positions[frozenMoves])
+	kept = positions < firstFrozen[gameIds]
+
+	removals = numpy.maximum(-block.increments[kept], 0)
+	rowRemovals = numpy.bincount(rows[kept], weights=removals, minlength=numRows)
+	squareRemovals = numpy.bincount(rows[kept]*9 + block.squares[kept], weights=removals, minlength=numRows*9).reshape(numRows, 9)
+	current = numpy.where(present[:, None] != 0, beads, defaults)
+	unsafe = ~frozen & ((totals - rowRemovals < 2) | (squareRemovals > current).any(axis=1))
+	unsafeGames = numpy.zeros(numGames, dtype=bool)
+	unsafeGames[gameIds[kept & unsafe[rows]]] = True
+	safe = kept & ~unsafeGames[gameIds]
+
+	safeRows = numpy.unique(rows[safe])
+	newRows = safeRows[present[safeRows] == 0]
+	beads[newRows] = defaults[newRows]
+	present[newRows] = 1
+	numpy.add.at(beads.reshape(-1), rows[safe]*9 + block.squares[safe], block.increments[safe].astype(numpy.int32))
+	matchboxes.ForgetCumulative(safeRows.tolist())
+
+	# Cat's games are all safe, having no moves
+	numUnsafe = int(unsafeGames.sum())
+	matchboxes.CountGames(numGames - numUnsafe)
+	unsafeMoves = unsafeGames[gameIds]
+	moveStarts = numpy.concatenate(([0], numpy.cumsum(numpy.diff(block.moveStarts)[unsafeGames])))
+	unsafeBlock = GameBlock(numUnsafe, block.indices[unsafeMoves].tolist(), block.squares[unsafeMoves].tolist(),
+			block.increments[unsafeMoves].tolist(), moveStarts.tolist(), 0)
+	LearnGamesOneAtATime(unsafeBlock, range(numUnsafe))
+	return
+
+
+@Timed
+def LearnFromGameBlock(block):
+	if numpy is None:
+		LearnGamesOneAtATime(block, range(block.numGames))
+	elif not GetMatchboxes().bulkWrites:
+		listBlock = GameBlock(block.numGames, numpy.asarray(block.indices).tolist(),
+				numpy.asarray(block.squares).tolist(), numpy.asarray(block.increments).tolist(),
+				numpy.asarray(block.moveStarts).tolist(), block.size)
+		LearnGamesOneAtATime(listBlock, range(block.numGames))
+	else:
+		LearnFromGameBlockWithNumpy(block)
+	return
+
+
+def LearnFromGameBytes(data):
+	"""
+	Learns from the whole games at the start of data
+
+	returns a tuple of (number of games, bytes up to the end of the last one)
+	"""
+	block = ParseGameBlock(data)
+	LearnFromGameBlock(block)
+	return (block.numGames, block.size)
+
+
+def LearnFromGameFile(file):
+	"""
+	Learns from the games in an open binary log, from where it is now to
+	the end. A game that is only partly written is left for next time
+
+	returns a tuple of (number of games, bytes read up to the end of the last one)
+	"""
+	numGames = 0
+	numBytes = 0
+	carry = b''
+	while True:
+		data = file.read(blockSize)
+		if not data:
+			break
+		data = carry + data
+		games, size = LearnFromGameBytes(data)
+		numGames += games
+		numBytes += size
+		carry = data[size:]
+	if carry:
+		# The last line of the log may not have a newline after it
+		games, size = LearnFromGameBytes(carry + b'\n')
+		numGames += games
+		numBytes += min(size, len(carry))
+	return (numGames, numBytes)
+
+
+def LearnFromGameLines(lines):
+	"""
+	Same as LearnFromGames, for lines laid out as Save writes them
+
+	returns the number of games learned
+	"""
+	lines = iter(lines)
+	numGames = 0
+	carry = b''
+	while True:
+		chunk = list(islice(lines, blockLines))
+		if not chunk:
+			break
+		data = carry + ('\n'.join(chunk) + '\n').encode('ascii')
+		games, size = LearnFromGameBytes(data)
+		numGames += games
+		carry = data[size:]
+	return numGames
@@ -0,0 +1,199 @@
+"""
+batchplay.py
+
+Plays thousands of games of self play at once, in lockstep, with numpy
+
+Every game in a batch starts on the empty board, so at each ply the
+same team is to move in all of the games still going. The boards are an
+array of indices, and each ply picks a square for every one of them
+from the matchbox buffer, plays it, looks up which games are over, and
+canonicalizes the rest, just as PlayGame does one game at a time. The
+batch is then learned from in one go with batchlearn
+
+The games in a batch all play against the matchboxes as they were when
+the batch started, so they learn more slowly per game than SelfPlay,
+which learns after every game. A batch of one game plays just like it
+
+Needs numpy
+"""
+
+from time import perf_counter
+
+from statetable import stateFlags
+from statetable import xWinsFlag
+from statetable import oWinsFlag
+from statetable import catsGameFlag
+from symmetry import canonicalIndices
+from position import squarePowers
+from matchbox import GetMatchboxes
+from matchbox import MatchboxStore
+from matchbox import ParsedGame
+from matchbox import ParsedMove
+from matchbox import numRows
+from matchbox import rowsOfIndices
+from matchbox import winBeads
+from matchbox import lossBeads
+from selfplay import SelfPlayResults
+from batchlearn import GameBlock
+from batchlearn import GetDefaultRows
+from batchlearn import LearnFromGameBlock
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+defaultBatchSize = 10000
+
+# Codes for the winner of each game in a batch
+liveGame = 0
+xWon = 1
+oWon = 2
+catsGame = 3
+
+
+class BatchTables:
+	"""
+	The state table, symmetry table and matchbox rows as numpy arrays
+	"""
+	def __init__(self):
+		flags = numpy.frombuffer(bytes(stateFlags), dtype=numpy.uint8)
+		self.xWins = (flags & xWinsFlag) != 0
+		self.oWins = (flags & oWinsFlag) != 0
+		self.catsGames = (flags & catsGameFlag) != 0
+		self.canonical = numpy.array(canonicalIndices, dtype=numpy.int64)
+		self.rows = numpy.array(rowsOfIndices, dtype=numpy.int64)
+		self.squarePowers = numpy.array(squarePowers, dtype=numpy.int64)
+		return
+
+
+batchTables = None
+
+def GetBatchTables():
+	global batchTables
+	if batchTables is None:
+		batchTables = BatchTables()
+	return batchTables
+
+
+class GameBatch:
+	"""
+	The moves of a batch of games, one ply to a row
+
+	indices[ply, game] is the canonical board the move was made on, and
+		squares[ply, game] the square played, or -1 once the game is over
+	winners holds xWon, oWon or catsGame for each game
+	"""
+	def __init__(self, indices, squares, winners):
+		self.indices = indices
+		self.squares = squares
+		self.winners = winners
+		return
+
+	def NumGames(self):
+		return len(self.winners)
+
+	def GameBlock(self):
+		"""
+		The moves of the games that were not cat's games, as a GameBlock
+		for LearnFromGameBlock
+		"""
+		decisive = self.winners != catsGame
+		played = (self.squares >= 0) & decisive
+		# X moves on the even plies
+		xMoves = (numpy.arange(self.squares.shape[0]) % 2 == 0)[:, None]
+		moverWon = numpy.where(xMoves, self.winners == xWon, self.winners == oWon)
+		increments = numpy.where(moverWon, winBeads, -lossBeads)
+		# Games are laid end to end, so the arrays are taken a game at a time
+		moveStarts = numpy.concatenate(([0], numpy.cumsum(played.sum(axis=0))))
+		return GameBlock(self.NumGames(), self.indices.T[played.T], self.squares.T[played.T],
+				increments.T[played.T], moveStarts, 0)
+
+	def ParsedGames(self):
+		games = []
+		winnerNames = {xWon: 'X', oWon: 'O', catsGame: 'C'}
+		for game in range(self.NumGames()):
+			parsedGame = ParsedGame()
+			parsedGame.winner = winnerNames[int(self.winners[game])]
+			for ply in range(self.squares.shape[0]):
+				square = int(self.squares[ply, game])
+				if square < 0:
+					break
+				parsedGame.moves.append(ParsedMove(int(self.indices[ply, game]), 'X' if ply % 2 == 0 else 'O', square))
+			games.append(parsedGame)
+		return games
+
+
+def PlayGameBatch(numGames, random):
+	"""
+	Plays numGames at once against the matchboxes as they are
+
+	random is a numpy random Generator
+
+	returns the GameBatch
+	"""
+	tables = GetBatchTables()
+	matchboxes = GetMatchboxes()
+	beads = numpy.frombuffer(matchboxes.buffer, dtype=numpy.int32, count=numRows*9).reshape(numRows, 9)
+	present = numpy.frombuffer(matchboxes.buffer, dtype=numpy.uint8, count=numRows, offset=MatchboxStore.beadsSize)
+	defaults = GetDefaultRows()
+
+	indices = numpy.full((9, numGames), -1, dtype=numpy.int64)
+	squares = numpy.full((9, numGames), -1, dtype=numpy.int64)
+	winners = numpy.full(numGames, liveGame, dtype=numpy.int8)
+	boards = numpy.zeros(numGames, dtype=numpy.int64)
+	live = numpy.arange(numGames)
+	for ply in range(9):
+		value, wins, won = (2, tables.xWins, xWon) if ply % 2 == 0 else (1, tables.oWins, oWon)
+		rows = tables.rows[boards]
+
+		# The same pick as MatchboxStore.PickSquare, for every game at once.
+		# Matchboxes that are not there yet are read as the default, so
+		# playing never writes to the store
+		rowBeads = numpy.where(present[rows, None] != 0, beads[rows], defaults[rows])
+		cumulative = numpy.cumsum(rowBeads, axis=1)
+		picks = random.random(len(live)) * cumulative[:, 8]
+		played = numpy.minimum((cumulative <= picks[:, None]).sum(axis=1), 8)
+		indices[ply, live] = boards
+		squares[ply, live] = played
+
+		children = boards + value * tables.squarePowers[played]
+		over = wins[children] | tables.catsGames[children]
+		winners[live[wins[children]]] = won
+		winners[live[tables.catsGames[children] & ~wins[children]]] = catsGame
+		live = live[~over]
+		boards = tables.canonical[children[~over]]
+		if len(live) == 0:
+			break
+	return GameBatch(indices, squares, winners)
+
+
+def BatchSelfPlay(numGames, batchSize=defaultBatchSize, learn=True, keepGames=False, seed=None):
+	"""
+	Plays numGames of the matchboxes against themselves, batchSize at a
+	time, learning from each batch once it is done
+
+	keepGames is True to hold on to every ParsedGame in the results
+	seed seeds the random numbers, for repeatable runs
+
+	returns the SelfPlayResults
+	"""
+	if numpy is None:
+		raise ImportError('BatchSelfPlay needs numpy')
+
+	random = numpy.random.default_rng(seed)
+	results = SelfPlayResults()
+	start = perf_counter()
+	while results.numGames < numGames:
+		batch = PlayGameBatch(min(batchSize, numGames - results.numGames), random)
+		if learn:
+			LearnFromGameBlock(batch.GameBlock())
+		if keepGames:
+			results.games.extend(batch.ParsedGames())
+		results.numGames += batch.NumGames()
+		results.xWins += int((batch.winners == xWon).sum())
+		results.oWins += int((batch.winners == oWon).sum())
+		results.catsGames += int((batch.winners == catsGame).sum())
+	results.seconds = perf_counter() - start
+	return results
@@ -0,0 +1,248 @@
+"""
+benchmark.py
+
+Times the board engine, the matchbox learner and self play, and checks
+the results against a stored baseline
+
+Every benchmark reseeds the random numbers and clears the matchboxes,
+and is run once to warm up before it is timed, so runs can be compared
+
+Command Line: python benchmark.py [--baseline FILE] [--save-baseline] [--output FILE]
+Exits with 1 if any benchmark is slower than the baseline by more than the tolerance,
+or if there is no baseline to compare against
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+from time import perf_counter
+
+from TicTacToe import IsWinner
+from TicTacToe import IndexBoard
+from TicTacToe import CanonicalizeBoard
+from TicTacToe import BoardFromIndex
+from statetable import numIndices
+from statetable import IsLegalIndex
+from matchbox import GetComputerMove
+from matchbox import ParseGames
+from matchbox import LearnFromGames
+from matchbox import ClearMatchboxes
+from selfplay import SelfPlay
+from batchlearn import LearnFromGameLines
+import batchplay
+from batchplay import BatchSelfPlay
+
+
+benchmarkSeed = 1234
+gamesFileName = 'games.txt'
+
+
+class Benchmark:
+	"""
+	name is what the results are filed under
+	setup is called before each run, and returns the function to time
+	numOps is the number of operations each timed function performs
+	"""
+	def __init__(self, name, setup, numOps):
+		self.name = name
+		self.setup = setup
+		self.numOps = numOps
+		return
+
+
+def LegalBoards(count):
+	"""
+	A fixed sample of boards that can come up in a game
+	"""
+	legal = [index for index in range(numIndices) if IsLegalIndex(index)]
+	return [BoardFromIndex(index) for index in random.Random(benchmarkSeed).sample(legal, count)]
+
+
+def LoadGameLines():
+	with open(gamesFileName, 'r') as file:
+		return file.read().splitlines()
+
+
+def BuildBenchmarks(scale=1):
+	"""
+	scale multiplies the number of self play games, for steadier timings
+	"""
+	boards = LegalBoards(1000)
+	indices = [IndexBoard(board) for board in boards]
+	lines = LoadGameLines()
+	numGames = 2000 * scale
+
+	def SetupIsWinner():
+		def Run():
+			for board in boards:
+				IsWinner(board, 'X')
+		return Run
+
+	def SetupIndexBoard():
+		def Run():
+			for board in boards:
+				IndexBoard(board)
+		return Run
+
+	def SetupCanonicalizeBoard():
+		def Run():
+			for board in boards:
+				CanonicalizeBoard(board)
+		return Run
+
+	def SetupBoardFromIndex():
+		def Run():
+			for index in indices:
+				BoardFromIndex(index)
+		return Run
+
+	def SetupGetComputerMove():
+		ClearMatchboxes()
+		def Run():
+			for board, index in zip(boards, indices):
+				GetComputerMove(board, index, 'X')
+		return Run
+
+	def SetupParseGames():
+		def Run():
+			ParseGames(lines)
+		return Run
+
+	def SetupLearnFromGames():
+		ClearMatchboxes()
+		def Run():
+			LearnFromGames(lines)
+		return Run
+
+	def SetupLearnFromGameLines():
+		ClearMatchboxes()
+		def Run():
+			LearnFromGameLines(lines)
+		return Run
+
+	def SetupSelfPlay():
+		ClearMatchboxes()
+		def Run():
+			SelfPlay(numGames, learn=True)
+		return Run
+
+	def SetupBatchSelfPlay():
+		ClearMatchboxes()
+		def Run():
+			BatchSelfPlay(10 * numGames, seed=benchmarkSeed)
+		return Run
+
+	numLogGames = len(ParseGames(lines))
+	benchmarks = (
+			Benchmark('IsWinner', SetupIsWinner, len(boards)),
+			Benchmark('IndexBoard', SetupIndexBoard, len(boards)),
+			Benchmark('CanonicalizeBoard', SetupCanonicalizeBoard, len(boards)),
+			Benchmark('BoardFromIndex', SetupBoardFromIndex, len(indices)),
+			Benchmark('GetComputerMove', SetupGetComputerMove, len(boards)),
+			Benchmark('ParseGames', SetupParseGames, numLogGames),
+			Benchmark('LearnFromGames', SetupLearnFromGames, numLogGames),
+			Benchmark('LearnFromGameLines', SetupLearnFromGameLines, numLogGames),
+			Benchmark('SelfPlay', SetupSelfPlay, numGames),
+		)
+	if batchplay.numpy is not None:
+		benchmarks += (Benchmark('BatchSelfPlay', SetupBatchSelfPlay, 10 * numGames),)
+	return benchmarks
+
+
+def RunBenchmark(benchmark, repeats):
+	"""
+	Warms up once, then times repeats runs and keeps the fastest
+
+	returns the operations per second of the fastest run
+	"""
+	random.seed(benchmarkSeed)
+	benchmark.setup()()
+
+	best = None
+	for _ in range(repeats):
+		random.seed(benchmarkSeed)
+		run = benchmark.setup()
+		start = perf_counter()
+		run()
+		seconds = perf_counter() - start
+		if best is None or seconds < best:
+			best = seconds
+	return benchmark.numOps / best
+
+
+def RunBenchmarks(repeats=5, scale=1):
+	"""
+	returns the results, ready to be written out as JSON
+	"""
+	results = {}
+	for benchmark in BuildBenchmarks(scale):
+		results[benchmark.name] = {'opsPerSecond': RunBenchmark(benchmark, repeats)}
+	return {
+			'python': platform.python_version(),
+			'machine': platform.machine(),
+			'repeats': repeats,
+			'benchmarks': results,
+		}
+
+
+def CompareResults(results, baseline, tolerance):
+	"""
+	Compares each benchmark against the baseline
+
+	returns a list of (name, ratio, regressed) tuples, where ratio is the
+	speed relative to the baseline
+	"""
+	comparisons = []
+	for name, result in results['benchmarks'].items():
+		if name not in baseline['benchmarks']:
+			continue
+		ratio = result['opsPerSecond'] / baseline['benchmarks'][name]['opsPerSecond']
+		comparisons.append((name, ratio, ratio < 1 - tolerance))
+	return comparisons
+
+
+def Main():
+	parser = argparse.ArgumentParser(description='Benchmarks the Tic-Tac-Toe engine and learner')
+	parser.add_argument('--output', default='bench_results.json', help='where to write the results')
+	parser.add_argument('--baseline', default='bench_baseline.json', help='results to compare against')
+	parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+	parser.add_argument('--tolerance', type=float, default=0.2, help='how much slower counts as a regression')
+	parser.add_argument('--repeats', type=int, default=5)
+	parser.add_argument('--scale', type=int, default=1, help='multiplies the number of self play games')
+	arguments = parser.parse_args()
+
+	results = RunBenchmarks(arguments.repeats, arguments.scale)
+	with open(arguments.output, 'w') as file:
+		json.dump(results, file, indent='\t')
+	if arguments.save_baseline:
+		with open(arguments.baseline, 'w') as file:
+			json.dump(results, file, indent='\t')
+
+	try:
+		with open(arguments.baseline, 'r') as file:
+			baseline = json.load(file)
+		comparisons = {name: (ratio, isRegression) for name, ratio, isRegression in
+				CompareResults(results, baseline, arguments.tolerance)}
+	except OSError:
+		baseline = None
+		comparisons = {}
+
+	regressed = False
+	for name, result in results['benchmarks'].items():
+		line = '{:20}{:>14.0f} ops/sec'.format(name, result['opsPerSecond'])
+		if name in comparisons:
+			ratio, isRegression = comparisons[name]
+			line += '{:>8.2f}x{}'.format(ratio, '  REGRESSION' if isRegression else '')
+			regressed = regressed or isRegression
+		print(line)
+	if baseline is None:
+		print(f'WARNING: there is no baseline at {arguments.baseline}, so nothing was compared. ' +
+				'Run with --save-baseline to store one')
+		return 1
+	return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+	sys.exit(Main())
@@ -0,0 +1,103 @@
+"""
+bitboard.py
+
+A bitboard engine for Tic-Tac-Toe. Each team is kept as a 9 bit mask,
+where bit n is set iff the team holds square n
+
+0|1|2
+-----
+3|4|5
+-----
+6|7|8
+"""
+
+fullMask = 0x1FF
+
+lineMasks = (
+		0b000000111, # rows
+		0b000111000,
+		0b111000000,
+		0b001001001, # columns
+		0b010010010,
+		0b100100100,
+		0b100010001, # diagonals
+		0b001010100,
+	)
+
+def BuildLinesThroughSquares():
+	"""
+	For each square, the line masks that include that square
+	"""
+	return tuple(tuple(line for line in lineMasks if line & (1 << square))
+			for square in range(9))
+
+
+linesThroughSquares = BuildLinesThroughSquares()
+
+
+def SquareMask(square):
+	"""
+	The mask with just the given square set
+	"""
+	return 1 << square
+
+
+def MaskFromBoard(board, team):
+	"""
+	Builds the mask of the squares held by team on a double list board
+	"""
+	mask = 0
+	bit = 1
+	for row in board:
+		for square in row:
+			if square == team:
+				mask |= bit
+			bit <<= 1
+	return mask
+
+
+def MasksFromBoard(board):
+	"""
+	Builds both masks in a single pass over the board
+
+	returns a tuple of (xMask, oMask)
+	"""
+	xMask = 0
+	oMask = 0
+	bit = 1
+	for row in board:
+		for square in row:
+			if square == 'X':
+				xMask |= bit
+			elif square == 'O':
+				oMask |= bit
+			bit <<= 1
+	return (xMask, oMask)
+
+
+def IsWinningMask(mask):
+	"""
+	returns True iff the mask holds all three squares of any line
+	"""
+	for line in lineMasks:
+		if mask & line == line:
+			return True
+	return False
+
+
+def IsWinningMove(mask, square):
+	"""
+	returns True iff the mask holds a whole line through square.
+	Only the 2 to 4 lines through the square just played need checking
+	"""
+	for line in linesThroughSquares[square]:
+		if mask & line == line:
+			return True
+	return False
+
+
+def CountMask(mask):
+	"""
+	Counts the squares held in the mask
+	"""
+	return bin(mask).count('1')
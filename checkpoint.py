@@ -0,0 +1,90 @@
+"""
+checkpoint.py
+
+Keeps a matchbox snapshot next to a games log, recording how far into
+the log the matchboxes have learned. Loading the log then only has to
+learn from the games appended since, instead of replaying all of it
+
+The checkpoint for games.txt is games.txt.ckpt
+
+A checkpoint also holds a fingerprint of the log, a hash of the offset
+and of the last fingerprintWindow bytes before it. If the log was
+replaced or rewritten since, the fingerprint will not match, and the
+whole log is learned again
+"""
+
+import os
+from hashlib import blake2b
+
+from matchbox import ClearMatchboxes
+from matchbox import GetMatchboxes
+from snapshot import SaveMatchboxSnapshot
+from snapshot import LoadMatchboxSnapshot
+from snapshot import fingerprintSize
+from batchlearn import LearnFromGameFile
+
+
+checkpointExtension = '.ckpt'
+fingerprintWindow = 1 << 16
+
+
+def CheckpointFileName(logFileName):
+	return logFileName + checkpointExtension
+
+
+def LogFingerprint(file, offset):
+	"""
+	The fingerprint of an open binary log up to offset. The file is left
+	at offset
+	"""
+	start = max(offset - fingerprintWindow, 0)
+	file.seek(start)
+	data = file.read(offset - start)
+	fingerprint = blake2b(offset.to_bytes(8, 'little'), digest_size=fingerprintSize)
+	fingerprint.update(data)
+	return fingerprint.digest()
+
+
+def LoadCheckpoint(logFileName):
+	"""
+	Loads the checkpoint for the log into the matchboxes. If there is no
+	checkpoint, or it does not fit the log, the matchboxes are cleared
+
+	returns the offset in the log to carry on learning from
+	"""
+	try:
+		header = LoadMatchboxSnapshot(CheckpointFileName(logFileName))
+		if header.logOffset <= os.path.getsize(logFileName):
+			with open(logFileName, 'rb') as file:
+				if LogFingerprint(file, header.logOffset) == header.logFingerprint:
+					return header.logOffset
+	except (OSError, ValueError):
+		pass
+	ClearMatchboxes()
+	return 0
+
+
+def CatchUpFromLog(logFileName):
+	"""
+	Brings the matchboxes up to date with the log, starting from its
+	checkpoint, and writes a new checkpoint at the end, if it can
+
+	The result is the same as clearing the matchboxes and learning from
+	the whole log
+
+	returns the number of games learned
+	"""
+	offset = LoadCheckpoint(logFileName)
+	gameCount = GetMatchboxes().gameCount
+	with open(logFileName, 'rb') as file:
+		file.seek(offset)
+		_, numBytes = LearnFromGameFile(file)
+		offset += numBytes
+		fingerprint = LogFingerprint(file, offset)
+	# The games are learned by now, so not being able to save the
+	# checkpoint only means the next load starts from the top
+	try:
+		SaveMatchboxSnapshot(CheckpointFileName(logFileName), offset, fingerprint)
+	except OSError as error:
+		print(f'Could not write the checkpoint: {error}')
+	return GetMatchboxes().gameCount - gameCount
@@ -0,0 +1,243 @@
+"""
+corpus.py
+
+A corpus of distinct games, each with the number of times it was played,
+so that a long run of self play is stored and learned from once per
+distinct game rather than once per game
+
+Games are logged on canonical boards, but a board with symmetries of
+its own has squares that are the same move. Taking the corner at the
+start is one move, whichever corner it is. Each square is swapped for
+the lowest square it is symmetric to on its board, so that games that
+only differ that way are counted together
+
+So learning from a corpus is not the same as replaying the log it was
+built from. A symmetric variant's beads go on the representative
+square rather than the square that was played, which is the same move
+in the matchbox's eyes, and all the plays of a distinct game are
+learned together rather than in the order they were logged, which
+matters once a matchbox is down to its last bead. It is the same as
+replaying the CanonicalGame of each game, with the plays of each
+distinct game in a row
+
+Games are keyed by their gamelog record. A corpus file is
+
+	4s	magic, b'TTTC'
+	H	version
+	H	reserved, 0
+
+followed by one little endian (record, count) pair of 64 bit numbers
+for each distinct game
+
+Command Line: python corpus.py {text log} {corpus}
+Builds a corpus from a text log
+"""
+
+import struct
+import sys
+from collections import Counter
+from itertools import repeat
+
+from symmetry import TransformIndex
+from symmetry import TransformSquare
+from matchbox import GetMatchboxes
+from matchbox import ParsedGame
+from matchbox import ParsedMove
+from matchbox import IterParseGames
+from matchbox import LearnFromParsedGames
+from matchbox import winBeads
+from matchbox import lossBeads
+from gamelog import PackGame
+from gamelog import UnpackGame
+
+
+corpusMagic = b'TTTC'
+corpusVersion = 1
+corpusHeaderFormat = '<4sHH'
+corpusHeaderSize = struct.calcsize(corpusHeaderFormat)
+corpusEntryFormat = '<QQ'
+
+# Filled in by RepresentativeSquares the first time each index is asked for
+representativeSquares = {}
+
+
+def RepresentativeSquares(index):
+	"""
+	For each square of the board, the lowest square that the board's own
+	symmetries take it to
+	"""
+	squares = representativeSquares.get(index)
+	if squares is None:
+		symmetries = [symmetry for symmetry in range(8) if TransformIndex(index, symmetry) == index]
+		squares = tuple(min(TransformSquare(square, symmetry) for symmetry in symmetries)
+				for square in range(9))
+		representativeSquares[index] = squares
+	return squares
+
+
+def CanonicalGame(parsedGame):
+	"""
+	The game with each square swapped for its representative square
+	"""
+	game = ParsedGame()
+	game.winner = parsedGame.winner
+	game.moves = [ParsedMove(move.index, move.mover, RepresentativeSquares(move.index)[move.square])
+			for move in parsedGame.moves]
+	return game
+
+
+class Corpus:
+	"""
+	counts maps the record of each distinct canonical game to the number
+	of times it was played
+	"""
+	def __init__(self):
+		self.counts = Counter()
+		return
+
+	def __len__(self):
+		return len(self.counts)
+
+	def __str__(self):
+		return f'Distinct games: {len(self)}, Games: {self.NumGames()}'
+
+	def NumGames(self):
+		return sum(self.counts.values())
+
+	def Add(self, parsedGame, count=1):
+		self.counts[PackGame(CanonicalGame(parsedGame))] += count
+		return
+
+	def AddGames(self, parsedGames):
+		for parsedGame in parsedGames:
+			self.Add(parsedGame)
+		return
+
+	def Items(self):
+		"""
+		yields a tuple of (ParsedGame, count) for each distinct game
+		"""
+		for record, count in self.counts.items():
+			yield (UnpackGame(record), count)
+
+	def Save(self, fileName):
+		with open(fileName, 'wb') as file:
+			file.write(struct.pack(corpusHeaderFormat, corpusMagic, corpusVersion, 0))
+			for record, count in self.counts.items():
+				file.write(struct.pack(corpusEntryFormat, record, count))
+		return
+
+
+def LoadCorpus(fileName):
+	"""
+	returns the Corpus saved in the file
+	"""
+	with open(fileName, 'rb') as file:
+		data = file.read()
+	if len(data) < corpusHeaderSize:
+		raise ValueError(f'{fileName} is too short to be a corpus')
+	magic, version, _ = struct.unpack_from(corpusHeaderFormat, data)
+	if magic != corpusMagic or version != corpusVersion:
+		raise ValueError(f'{fileName} is not a version {corpusVersion} corpus')
+	corpus = Corpus()
+	entrySize = struct.calcsize(corpusEntryFormat)
+	numEntries = (len(data) - corpusHeaderSize) // entrySize
+	for record, count in struct.iter_unpack(corpusEntryFormat,
+			data[corpusHeaderSize:corpusHeaderSize + numEntries*entrySize]):
+		corpus.counts[record] += count
+	return corpus
+
+
+def BuildCorpus(textFileName):
+	"""
+	returns the Corpus of the games in a text log
+	"""
+	corpus = Corpus()
+	with open(textFileName, 'r') as file:
+		corpus.AddGames(IterParseGames(file))
+	return corpus
+
+
+def RepeatsUntilOne(total, increment):
+	"""
+	The number of times increment can be added to total before it is
+	exactly 1, or None if it never will be
+	"""
+	if total == 1 or increment == 0 or (1 - total) % increment != 0 or (1 - total) // increment < 0:
+		return None
+	return (1 - total) // increment
+
+
+def LearnFromCountedGame(parsedGame, count):
+	"""
+	Learns from the game count times over in one update, leaving the
+	matchboxes as learning from it count times in a row would
+
+	Each time through, learning stops at the first matchbox down to its
+	last bead, and takes beads from a square only until it has none. The
+	boards of a game are all different, so until one of the matchboxes
+	before that stop gets down to its last bead, or one of the squares
+	runs out, each time through adds the same beads. Those repeats are
+	added in one go, and then the new stop is found
+	"""
+	matchboxes = GetMatchboxes()
+	if not matchboxes.bulkWrites:
+		# A locked store has to be changed a move at a time, under its locks
+		LearnFromParsedGames(repeat(parsedGame, count))
+		return
+	matchboxes.CountGames(count)
+	if parsedGame.winner == 'C':
+		return
+
+	increments = [winBeads if move.mover == parsedGame.winner else -lossBeads for move in parsedGame.moves]
+	remaining = count
+	while remaining > 0:
+		steps = []
+		repeats = remaining
+		for move, increment in zip(parsedGame.moves, increments):
+			total = matchboxes.Total(move.index)
+			if total == 1:
+				# There is only one bead left in the matchbox. Don't remove it!
+				break
+			beads = matchboxes.Row(move.index)[move.square]
+			step = max(increment, -beads)
+			if step < 0:
+				# At most down to no beads, after which the step changes
+				repeats = min(repeats, max(beads // -step, 1))
+			untilOne = RepeatsUntilOne(total, step)
+			if untilOne is not None:
+				repeats = min(repeats, untilOne)
+			steps.append(step)
+		if not steps:
+			break
+
+		for move, step in zip(parsedGame.moves, steps):
+			if step != 0:
+				matchboxes.AddBeads(move.index, move.square, repeats * step)
+		remaining -= repeats
+	return
+
+
+def LearnFromCorpus(corpus):
+	"""
+	Learns from each distinct game in the corpus, weighted by its count
+
+	returns the number of games learned
+	"""
+	for parsedGame, count in corpus.Items():
+		LearnFromCountedGame(parsedGame, count)
+	return corpus.NumGames()
+
+
+def Main():
+	if len(sys.argv) != 3:
+		print('Usage: python corpus.py {text log} {corpus}')
+		return 1
+	corpus = BuildCorpus(sys.argv[1])
+	corpus.Save(sys.argv[2])
+	print(corpus)
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(Main())
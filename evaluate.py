@@ -0,0 +1,158 @@
+"""
+evaluate.py
+
+Measures how the matchboxes improve as they train
+
+Every so many training games, a frozen copy of the matchboxes is handed
+to a pool of worker processes, which play it against a random player and
+a perfect player while the training carries on. The win, draw and loss
+rates at each point are written to a CSV file as a learning curve
+"""
+
+import csv
+from multiprocessing import Pool
+from multiprocessing import cpu_count
+from random import choice
+
+from statetable import LegalMoves
+from matchbox import GetComputerMoveForIndex
+from matchbox import SnapshotMatchboxes
+from matchbox import LoadMatchboxes
+from selfplay import PlayGame
+from selfplay import SelfPlay
+from parallel import SplitGames
+from parallel import UsePrivateMatchboxes
+from solver import GetPerfectMoveForIndex
+
+
+def GetRandomMoveForIndex(index):
+	"""
+	A player that picks any empty square
+	"""
+	return choice(LegalMoves(index))
+
+
+opponents = {
+		'Random': GetRandomMoveForIndex,
+		'Perfect': GetPerfectMoveForIndex,
+	}
+
+csvFields = ('trainingGames', 'opponent', 'games', 'wins', 'draws', 'losses',
+		'winRate', 'drawRate', 'lossRate', 'trainingGamesPerSecond')
+
+
+class Evaluation:
+	"""
+	The results of playing the matchboxes against one opponent, at one
+	point in training. The matchboxes play X in every other game
+	"""
+	def __init__(self, trainingGames, opponent, trainingGamesPerSecond):
+		self.trainingGames = trainingGames
+		self.opponent = opponent
+		self.trainingGamesPerSecond = trainingGamesPerSecond
+		self.wins = 0
+		self.draws = 0
+		self.losses = 0
+		return
+
+	def __str__(self):
+		return (f'Trained: {self.trainingGames}, vs {self.opponent}: ' +
+				f'W {self.wins} D {self.draws} L {self.losses}')
+
+	def NumGames(self):
+		return self.wins + self.draws + self.losses
+
+	def Row(self):
+		numGames = self.NumGames()
+		return {
+				'trainingGames': self.trainingGames,
+				'opponent': self.opponent,
+				'games': numGames,
+				'wins': self.wins,
+				'draws': self.draws,
+				'losses': self.losses,
+				'winRate': self.wins / numGames,
+				'drawRate': self.draws / numGames,
+				'lossRate': self.losses / numGames,
+				'trainingGamesPerSecond': self.trainingGamesPerSecond,
+			}
+
+
+def EvaluateShare(task):
+	"""
+	Runs in a worker process
+
+	task is a tuple of (snapshot, opponent name, first game number, number of games)
+
+	returns a tuple of (wins, draws, losses) for the matchboxes
+	"""
+	snapshot, opponentName, firstGame, numGames = task
+	LoadMatchboxes(snapshot)
+	opponent = opponents[opponentName]
+	wins = 0
+	draws = 0
+	losses = 0
+	for gameNumber in range(firstGame, firstGame + numGames):
+		team = 'X' if gameNumber % 2 == 0 else 'O'
+		players = {team: GetComputerMoveForIndex, ('O' if team == 'X' else 'X'): opponent}
+		winner = PlayGame(players).winner
+		if winner == team:
+			wins += 1
+		elif winner == 'C':
+			draws += 1
+		else:
+			losses += 1
+	return (wins, draws, losses)
+
+
+def TrainWithEvaluation(numGames, evalInterval, evalGames, csvFileName=None, numWorkers=None):
+	"""
+	Trains the matchboxes with numGames of self play, evaluating them
+	before training starts and after every evalInterval games
+
+	evalGames is the number of games played against each opponent at
+		each evaluation
+	csvFileName, if given, is where the learning curve is written
+	numWorkers is the number of evaluation processes, defaulting to the
+		number of cores
+
+	returns the list of Evaluations, in training order
+	"""
+	if numWorkers is None:
+		numWorkers = cpu_count()
+
+	evaluations = []
+	pending = []
+	with Pool(numWorkers, initializer=UsePrivateMatchboxes) as pool:
+		trainingGames = 0
+		gamesPerSecond = 0.0
+		while True:
+			snapshot = SnapshotMatchboxes()
+			for opponentName in opponents:
+				evaluation = Evaluation(trainingGames, opponentName, gamesPerSecond)
+				evaluations.append(evaluation)
+				firstGame = 0
+				for share in SplitGames(evalGames, numWorkers):
+					task = (snapshot, opponentName, firstGame, share)
+					pending.append((evaluation, pool.apply_async(EvaluateShare, (task,))))
+					firstGame += share
+
+			if trainingGames >= numGames:
+				break
+			results = SelfPlay(min(evalInterval, numGames - trainingGames), learn=True)
+			trainingGames += results.numGames
+			gamesPerSecond = results.GamesPerSecond()
+
+		for evaluation, result in pending:
+			wins, draws, losses = result.get()
+			evaluation.wins += wins
+			evaluation.draws += draws
+			evaluation.losses += losses
+
+	if csvFileName is not None:
+		with open(csvFileName, 'w', newline='') as file:
+			writer = csv.DictWriter(file, fieldnames=csvFields)
+			writer.writeheader()
+			for evaluation in evaluations:
+				writer.writerow(evaluation.Row())
+	return evaluations
@@ -2,21 +2,36 @@
 This handles the game play of Tic-Tac-Toe
 """
 
+import cProfile
+import pstats
+
 
-from TicTacToe import IsWinner
-from TicTacToe import IsCatsGame
 from TicTacToe import ValidateMove
 from TicTacToe import Move
-from TicTacToe import IndexBoard
-from TicTacToe import CanonicalizeBoard
 from TicTacToe import BoardFromIndex
 from TicTacToe import MoveValidation
+from position import Position
 
 from matchbox import matchboxes
 from matchbox import GetComputerMove
 from matchbox import GetMatchboxes
-from matchbox import ClearMatchboxes
 from matchbox import LearnFromGames
+from matchbox import LinesFromParsedGame
+from matchbox import ParseGames
+
+from selfplay import SelfPlay
+from parallel import ParallelSelfPlay
+from sweep import SweepTrain
+from batchplay import BatchSelfPlay
+from evaluate import TrainWithEvaluation
+from snapshot import SaveMatchboxSnapshot
+from snapshot import LoadMatchboxSnapshot
+from checkpoint import CatchUpFromLog
+from corpus import Corpus
+from corpus import LoadCorpus
+from corpus import LearnFromCorpus
+
+import instrument
 
 
 def StringFromBoard(board):
@@ -97,10 +112,11 @@ def PlayTicTacToe(numPlayers):
 			[' ', ' ', ' '],
 			[' ', ' ', ' ']
 		]
+	position = Position()
 	nextMover = 'X'
 	game = []
 	while True:
-		index = IndexBoard(board)
+		index = position.index
 		game.append('I {}'.format(index))
 		nextPlayer = teams[nextMover]
 		if nextPlayer == 'H':
@@ -109,10 +125,11 @@ def PlayTicTacToe(numPlayers):
 			move = GetComputerMove(board, index, nextMover)
 			print('The Computer has chosen {}.'.format(move))
 		Move(board, nextMover, move)
+		position.Move(nextMover, move)
 		game.append('M {} {}'.format(nextMover, move))
 		print(StringFromBoard(board))
 
-		canonicalBoard, index, rotations, flips = CanonicalizeBoard(board)
+		rotations, flips = position.Canonicalize()
 		if rotations > 0:
 			print('Rotate {} times'.format(rotations))
 			game.append('R {}'.format(rotations))
@@ -120,15 +137,15 @@ def PlayTicTacToe(numPlayers):
 			print ('Flip Horizontally')
 			game.append('F {}'.format(flips))
 		if rotations > 0 or flips > 0:
-			board = canonicalBoard
+			board = position.Board()
 			print(StringFromBoard(board))
 		
-		if IsWinner(board, nextMover):
+		if position.winner == nextMover:
 			print ('{} is the Winner!'.format(nextMover))
 			game.append('W {}'.format(nextMover))
 			break
 		
-		if IsCatsGame(board):
+		if position.IsCatsGame():
 			print("No winner! Cat's game.")
 			game.append('C')
 			break
@@ -169,18 +186,110 @@ def LoadListFromFile():
 	"""
 	Loads the file, the parses the games out of it to prime the 
 	matchboxes
+
+	The file is read a buffer at a time and learned from as it is
+	parsed, so it is never held in memory all at once. If the file has
+	a checkpoint, only the games added since the checkpoint are learned
 	"""
 	while True:
 		fileName = input('What file should we read from, Professor? ')
 		try:
-			with open(fileName, 'r') as file:
-				games = file.read().splitlines()
-				ClearMatchboxes()
-				LearnFromGames(games)
-				break
+			numGames = CatchUpFromLog(fileName)
+			print('Learned from {} new games.'.format(numGames))
+			break
+		except (OSError, ValueError) as error:
+			print('{}, try again.'.format(error))
+
+	return
+
+
+def SaveMatchboxesInFile():
+	"""
+	Saves the matchboxes themselves, rather than the games they learned from
+	"""
+	while True:
+		fileName = input('What file should we save the matchboxes to, Professor? ')
+		try:
+			SaveMatchboxSnapshot(fileName)
+			break
 		except OSError as error:
 			print('{}, try again.'.format(error))
+	return
 
+
+def LoadMatchboxesFromFile():
+	"""
+	Loads matchboxes saved by SaveMatchboxesInFile, replacing the current ones
+	"""
+	while True:
+		fileName = input('What file should we load the matchboxes from, Professor? ')
+		try:
+			header = LoadMatchboxSnapshot(fileName)
+			print(header)
+			break
+		except (OSError, ValueError) as error:
+			print('{}, try again.'.format(error))
+	return
+
+
+def SaveCorpusInFile(games, parsedGames):
+	"""
+	Saves the games as a corpus, with each distinct game stored once
+	along with the number of times it was played
+
+	games are lists of log lines, and parsedGames are ParsedGames
+	"""
+	corpus = Corpus()
+	for game in games:
+		corpus.AddGames(ParseGames(game))
+	corpus.AddGames(parsedGames)
+	while True:
+		fileName = input('What file should we save the corpus to, Professor? ')
+		try:
+			corpus.Save(fileName)
+			print(corpus)
+			break
+		except OSError as error:
+			print('{}, try again.'.format(error))
+	return
+
+
+def LoadCorpusFromFile():
+	"""
+	Learns from a corpus saved by SaveCorpusInFile, one update per distinct game
+
+	Symmetric variants were merged when the corpus was saved, so the beads
+	for them land on one square of each set of symmetric squares, and may
+	differ from replaying the games' log (see corpus.py)
+	"""
+	while True:
+		fileName = input('What file should we load the corpus from, Professor? ')
+		try:
+			numGames = LearnFromCorpus(LoadCorpus(fileName))
+			print('Learned from {} games.'.format(numGames))
+			break
+		except (OSError, ValueError) as error:
+			print('{}, try again.'.format(error))
+	return
+
+
+numHotspots = 20
+
+def ProfileSelfPlay(numGames):
+	"""
+	Runs numGames of headless self play under cProfile, and prints the
+	functions that took the most time. If instrumentation is on, its
+	counters for the run are printed too
+	"""
+	instrument.Reset()
+	profile = cProfile.Profile()
+	profile.enable()
+	results = SelfPlay(numGames, learn=True)
+	profile.disable()
+	print(results)
+	pstats.Stats(profile).sort_stats(pstats.SortKey.TIME).print_stats(numHotspots)
+	if instrument.enabled:
+		print(instrument.Report())
 	return
 
 
@@ -197,6 +306,7 @@ def Play():
 	ToDo: implement Global Thermonuclear War
 	"""
 	ticTacToeGames = []
+	trainedGames = []
 	while True:
 		gameName = input('Shall we play a game? ')
 		if gameName == 'TicTacToe':
@@ -205,15 +315,52 @@ def Play():
 			ticTacToeGames.append(game)
 
 		elif gameName == 'Save':
-			SaveListInFile(ticTacToeGames)
+			SaveListInFile(ticTacToeGames + [LinesFromParsedGame(game) for game in trainedGames])
 		elif gameName == 'Load':
 			LoadListFromFile()
+		elif gameName == 'SaveCorpus':
+			SaveCorpusInFile(ticTacToeGames, trainedGames)
+		elif gameName == 'LoadCorpus':
+			LoadCorpusFromFile()
+		elif gameName == 'SaveMatchboxes':
+			SaveMatchboxesInFile()
+		elif gameName == 'LoadMatchboxes':
+			LoadMatchboxesFromFile()
+		elif gameName == 'Evaluate':
+			numGames = int(input('How many games, Professsor? '))
+			evalInterval = int(input('How many games between evaluations, Professor? '))
+			evalGames = int(input('How many evaluation games, Professor? '))
+			fileName = input('What file should we write the learning curve to, Professor? ')
+			for evaluation in TrainWithEvaluation(numGames, evalInterval, evalGames, fileName):
+				print(evaluation)
+		elif gameName == 'Profile':
+			numGames = int(input('How many games, Professsor? '))
+			ProfileSelfPlay(numGames)
 		elif gameName == 'Matchboxes':
 			PrintMatchboxes()
 		elif gameName == 'Learn':
 			numGames = int(input('How many games, Professsor? '))
 			for _ in range(numGames):
 				ticTacToeGames.append(PlayTicTacToe(0))
+		elif gameName == 'Train':
+			numGames = int(input('How many games, Professsor? '))
+			results = SelfPlay(numGames, learn=True, keepGames=True)
+			trainedGames.extend(results.games)
+			print(results)
+		elif gameName == 'ParallelTrain':
+			numGames = int(input('How many games, Professsor? '))
+			numWorkers = int(input('How many processes, Professor? '))
+			results = ParallelSelfPlay(numGames, numWorkers)
+			print(results)
+		elif gameName == 'BatchTrain':
+			numGames = int(input('How many games, Professsor? '))
+			batchSize = int(input('How many games at once, Professor? '))
+			print(BatchSelfPlay(numGames, batchSize))
+		elif gameName == 'Sweep':
+			numPasses = int(input('How many passes, Professor? '))
+			samplesPerBoard = int(input('How many games from each board, Professor? (0 for all of them) '))
+			results = SweepTrain(numPasses, samplesPerBoard if samplesPerBoard > 0 else None)
+			print(results)
 		elif gameName == "No":
 			print ('Good-Bye, Professor')
 			break
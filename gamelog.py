@@ -0,0 +1,220 @@
+"""
+gamelog.py
+
+A compact binary games log, with one 64 bit record for each game in
+place of the text lines. The file starts with an 8 byte header
+
+	4s	magic, b'TTTG'
+	H	version
+	H	reserved, 0
+
+followed by one little endian record per game
+
+	bits 0-35	the square of each move, 4 bits each, first move lowest
+	bits 36-39	the number of moves
+	bits 40-41	the result, 1 if X won, 2 if O won, 3 for a cat's game
+
+Only the squares are stored. As in the text log, each move is made on
+the canonical board, so the board indices are worked out again by
+replaying the game and canonicalizing after every move
+
+Command Line: python gamelog.py {text log} {binary log}
+Converts a text log to a binary one
+"""
+
+import mmap
+import struct
+import sys
+
+from statetable import LegalMoves
+from symmetry import CanonicalIndex
+from position import ChildIndex
+from matchbox import ParsedGame
+from matchbox import ParsedMove
+from matchbox import IterParseGames
+from matchbox import LearnFromParsedGames
+from batchplay import GameBatch
+from batchplay import GetBatchTables
+from batchlearn import LearnFromGameBlock
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+gameLogMagic = b'TTTG'
+gameLogVersion = 1
+gameLogHeaderFormat = '<4sHH'
+gameLogHeaderSize = struct.calcsize(gameLogHeaderFormat)
+recordSize = 8
+
+movesShift = 36
+resultShift = 40
+resultCodes = {'X': 1, 'O': 2, 'C': 3}
+resultNames = {code: name for name, code in resultCodes.items()}
+
+# The games unpacked and learned at a time by LearnFromBinaryLog
+blockGames = 1 << 14
+
+
+def PackGame(parsedGame):
+	"""
+	Packs the game into its record. The game's boards have to be the
+	canonical boards that come from replaying it, as in a log that
+	PlayTicTacToe wrote, since only the squares are kept
+
+	returns the record, as an int
+	"""
+	record = 0
+	index = 0
+	for move, parsedMove in enumerate(parsedGame.moves):
+		if parsedMove.index != index or parsedMove.mover != ('X' if move % 2 == 0 else 'O'):
+			raise ValueError(f'Move {move} is not on the board from replaying the game')
+		if parsedMove.square not in LegalMoves(index):
+			raise ValueError(f'Move {move} is not a legal move')
+		record |= parsedMove.square << (4 * move)
+		index = CanonicalIndex(ChildIndex(index, parsedMove.square))
+	record |= len(parsedGame.moves) << movesShift
+	record |= resultCodes[parsedGame.winner] << resultShift
+	return record
+
+
+def UnpackGame(record):
+	"""
+	returns the ParsedGame, replayed from the record
+	"""
+	game = ParsedGame()
+	game.winner = resultNames[(record >> resultShift) & 3]
+	index = 0
+	for move in range((record >> movesShift) & 0xF):
+		square = (record >> (4 * move)) & 0xF
+		game.moves.append(ParsedMove(index, 'X' if move % 2 == 0 else 'O', square))
+		index = CanonicalIndex(ChildIndex(index, square))
+	return game
+
+
+def WriteGameLog(fileName, parsedGames, append=False):
+	"""
+	Writes the games to a binary log, or adds them to the end of it
+
+	returns the number of games written
+	"""
+	numGames = 0
+	with open(fileName, 'ab' if append else 'wb') as file:
+		if file.tell() == 0:
+			file.write(struct.pack(gameLogHeaderFormat, gameLogMagic, gameLogVersion, 0))
+		for parsedGame in parsedGames:
+			file.write(PackGame(parsedGame).to_bytes(recordSize, 'little'))
+			numGames += 1
+	return numGames
+
+
+def ConvertTextLog(textFileName, binaryFileName):
+	"""
+	Converts a text log, as Save writes it, to a binary one
+
+	returns the number of games
+	"""
+	with open(textFileName, 'r') as file:
+		return WriteGameLog(binaryFileName, IterParseGames(file))
+
+
+class BinaryGameLog:
+	"""
+	A binary log mapped into memory. records is a view of the bytes of
+	the records in the map, so nothing is copied until a game is unpacked
+
+	Close it, or use it in a with statement, to let go of the file
+	"""
+	def __init__(self, fileName):
+		with open(fileName, 'rb') as file:
+			self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+		if len(self.map) < gameLogHeaderSize:
+			self.map.close()
+			raise ValueError(f'{fileName} is too short to be a games log')
+		magic, version, _ = struct.unpack_from(gameLogHeaderFormat, self.map)
+		if magic != gameLogMagic or version != gameLogVersion:
+			self.map.close()
+			raise ValueError(f'{fileName} is not a version {gameLogVersion} games log')
+		numRecords = (len(self.map) - gameLogHeaderSize) // recordSize
+		self.view = memoryview(self.map)
+		self.records = self.view[gameLogHeaderSize:gameLogHeaderSize + numRecords*recordSize]
+		return
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception):
+		self.Close()
+		return False
+
+	def __len__(self):
+		return len(self.records) // recordSize
+
+	def Games(self):
+		"""
+		Unpacks each game in turn
+		"""
+		for record, in struct.iter_unpack('<Q', self.records):
+			yield UnpackGame(record)
+
+	def GameBatch(self, start=0, stop=None):
+		"""
+		Unpacks the games from start up to stop all at once with numpy,
+		replaying them a ply at a time
+
+		returns the batchplay.GameBatch
+		"""
+		tables = GetBatchTables()
+		start, stop, _ = slice(start, stop).indices(len(self))
+		records = numpy.frombuffer(self.records[start*recordSize:stop*recordSize], dtype='<u8').astype(numpy.int64)
+		numMoves = (records >> movesShift) & 0xF
+		winners = ((records >> resultShift) & 3).astype(numpy.int8)
+		indices = numpy.full((9, len(records)), -1, dtype=numpy.int64)
+		squares = numpy.full((9, len(records)), -1, dtype=numpy.int64)
+		boards = numpy.zeros(len(records), dtype=numpy.int64)
+		for ply in range(9):
+			played = ply < numMoves
+			plySquares = (records >> (4 * ply)) & 0xF
+			indices[ply] = numpy.where(played, boards, -1)
+			squares[ply] = numpy.where(played, plySquares, -1)
+			children = boards + numpy.where(played, (2 if ply % 2 == 0 else 1) * tables.squarePowers[numpy.minimum(plySquares, 8)], 0)
+			boards = tables.canonical[children]
+		return GameBatch(indices, squares, winners)
+
+	def Close(self):
+		self.records.release()
+		self.view.release()
+		self.map.close()
+		return
+
+
+def LearnFromBinaryLog(fileName):
+	"""
+	Learns from every game in a binary log, as LearnFromGames would from
+	the text log. With numpy, blockGames games at a time are unpacked and
+	learned in one go
+
+	returns the number of games
+	"""
+	with BinaryGameLog(fileName) as log:
+		if numpy is None:
+			LearnFromParsedGames(log.Games())
+		else:
+			for start in range(0, len(log), blockGames):
+				LearnFromGameBlock(log.GameBatch(start, start + blockGames).GameBlock())
+		return len(log)
+
+
+def Main():
+	if len(sys.argv) != 3:
+		print('Usage: python gamelog.py {text log} {binary log}')
+		return 1
+	numGames = ConvertTextLog(sys.argv[1], sys.argv[2])
+	print(f'Converted {numGames} games')
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(Main())
@@ -0,0 +1,184 @@
+"""
+lockedstore.py
+
+A matchbox store that many threads can play and learn from at once, such
+as the sessions of a threaded server
+
+Learning a move reads a matchbox's total and then changes its beads, and
+picking a square reads the running sums that learning keeps up to date.
+Two threads doing either on the same matchbox can lose beads, or take
+the last one. Each matchbox is guarded by one of numStripes locks,
+picked by its row, so threads on different boards seldom wait on each
+other, and a move is learned under its matchbox's lock from start to end
+
+Batch learning and the corpus write many matchboxes at once, straight
+into the buffer. Given a locked store, they learn one move at a time
+through LearnMove instead, which is slower but takes the locks
+
+Command Line: python lockedstore.py [pause in ms]
+Times threaded self play on 1, 2, 4 and 8 threads, pausing between games
+as if waiting on a client
+"""
+
+import sys
+from threading import Lock
+from threading import RLock
+from threading import Thread
+from time import perf_counter
+from time import sleep
+
+from matchbox import MatchboxStore
+from matchbox import GetMatchboxes
+from matchbox import UseMatchboxes
+from matchbox import GetComputerMoveForIndex
+from matchbox import LearnFromParsedGames
+from matchbox import rowsOfIndices
+from selfplay import PlayGame
+from selfplay import SelfPlayResults
+from parallel import SplitGames
+
+
+numStripes = 64
+
+
+class LockedMatchboxStore(MatchboxStore):
+	"""
+	A MatchboxStore with a lock for every stripe of rows, and one for
+	gameCount. Clear takes all of them
+	"""
+	bulkWrites = False
+
+	def __init__(self, buffer=None):
+		MatchboxStore.__init__(self, buffer)
+		# Reentrant, since the store's methods call each other
+		self.locks = [RLock() for _ in range(numStripes)]
+		self.countLock = Lock()
+		return
+
+	def Lock(self, index):
+		"""
+		The lock that guards the index's matchbox
+		"""
+		row = rowsOfIndices[index]
+		if row < 0:
+			raise KeyError(index)
+		return self.locks[row % numStripes]
+
+	def __setitem__(self, index, matchbox):
+		with self.Lock(index):
+			MatchboxStore.__setitem__(self, index, matchbox)
+		return
+
+	def Row(self, index):
+		with self.Lock(index):
+			return MatchboxStore.Row(self, index)
+
+	def Cumulative(self, index):
+		with self.Lock(index):
+			return MatchboxStore.Cumulative(self, index)
+
+	def AddBeads(self, index, square, count):
+		with self.Lock(index):
+			MatchboxStore.AddBeads(self, index, square, count)
+		return
+
+	def LearnMove(self, index, square, count):
+		with self.Lock(index):
+			return MatchboxStore.LearnMove(self, index, square, count)
+
+	def PickSquare(self, index):
+		with self.Lock(index):
+			return MatchboxStore.PickSquare(self, index)
+
+	def ApplyDelta(self, index, delta):
+		with self.Lock(index):
+			MatchboxStore.ApplyDelta(self, index, delta)
+		return
+
+	def CountGames(self, numGames):
+		with self.countLock:
+			self.gameCount += numGames
+		return
+
+	def ForgetCumulative(self, rows):
+		for row in rows:
+			with self.locks[row % numStripes]:
+				self.cumulative[row] = None
+		return
+
+	def Clear(self):
+		for lock in self.locks:
+			lock.acquire()
+		try:
+			with self.countLock:
+				MatchboxStore.Clear(self)
+		finally:
+			for lock in self.locks:
+				lock.release()
+		return
+
+
+def UseLockedMatchboxes():
+	"""
+	Swaps the matchboxes for a LockedMatchboxStore holding a copy of them
+
+	returns the LockedMatchboxStore
+	"""
+	current = GetMatchboxes()
+	store = LockedMatchboxStore(bytearray(current.buffer))
+	store.gameCount = current.gameCount
+	UseMatchboxes(store)
+	return store
+
+
+def ThreadedSelfPlay(numGames, numThreads, pause=0.0):
+	"""
+	Plays numGames of the matchboxes against themselves on numThreads
+	threads, each learning from its games as it goes. The matchboxes
+	have to be a LockedMatchboxStore (see UseLockedMatchboxes)
+
+	pause is the seconds each thread sleeps after every game, standing in
+		for the time a server spends waiting on its clients
+
+	returns the SelfPlayResults
+	"""
+	if not isinstance(GetMatchboxes(), LockedMatchboxStore):
+		raise ValueError('ThreadedSelfPlay needs a LockedMatchboxStore')
+
+	players = {'X': GetComputerMoveForIndex, 'O': GetComputerMoveForIndex}
+	shares = SplitGames(numGames, numThreads)
+	threadResults = [SelfPlayResults() for _ in shares]
+
+	def PlayShare(share, results):
+		for _ in range(share):
+			game = PlayGame(players)
+			LearnFromParsedGames((game,))
+			results.Tally(game)
+			if pause:
+				sleep(pause)
+		return
+
+	start = perf_counter()
+	threads = [Thread(target=PlayShare, args=(share, results)) for share, results in zip(shares, threadResults)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	results = SelfPlayResults()
+	for share in threadResults:
+		results.Merge(share)
+	results.seconds = perf_counter() - start
+	return results
+
+
+def Main():
+	pause = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.001
+	UseLockedMatchboxes()
+	for numThreads in (1, 2, 4, 8):
+		results = ThreadedSelfPlay(500 * numThreads, numThreads, pause)
+		print(f'Threads: {numThreads}, {results}')
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(Main())
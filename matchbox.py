@@ -4,13 +4,223 @@ matchbox.py
 Implements a matchbox style machine learning bed for TicTacToe
 """
 
+from array import array
+from bisect import bisect
 from itertools import accumulate
 from random import choices
+from random import random
 from random import seed
-from TicTacToe import BoardFromIndex
+from statetable import EmptySquares
+from statetable import IsLegalIndex
+from statetable import numIndices
+from instrument import Timed
+from instrument import Count
+from instrument import enabled as instrumented
 
 
-matchboxes = {}
+# The beads in each empty square of a new matchbox, and the beads added
+# for a winning move or taken away for a losing one
+defaultBeads = 5
+winBeads = 1
+lossBeads = 1
+
+# Only boards that can come up in a game get a matchbox row
+matchboxIndices = array('H', [index for index in range(numIndices) if IsLegalIndex(index)])
+numRows = len(matchboxIndices)
+rowsOfIndices = array('h', [-1] * numIndices)
+for row, index in enumerate(matchboxIndices):
+	rowsOfIndices[index] = row
+
+
+class MatchboxStore:
+	"""
+	Holds all of the matchboxes in one contiguous buffer, in place of a
+	dict of lists. The buffer is laid out as
+
+		numRows*9 32 bit bead counts, one row of 9 per legal board
+		numRows presence bytes, 1 iff the row's matchbox has been created
+
+	The store reads like the dict it replaces. store[index] is a view onto
+	the row, so changing it changes the store, just like the lists did.
+	Asking for the matchbox of an illegal board raises KeyError
+
+	The store also caches the running sums of each row's beads for picking
+	squares. Change beads with AddBeads, or by assigning store[index], so
+	the cache stays right. Writes straight into a view are not seen
+
+	A read only store, such as one on a mapped file, never writes to its
+	buffer. Matchboxes that are not there yet are read as the default
+	"""
+	beadsSize = numRows * 9 * 4
+	bufferSize = beadsSize + numRows
+	# True if batch learning may write straight into the buffer
+	bulkWrites = True
+
+	def __init__(self, buffer=None, readOnly=False):
+		if buffer is None:
+			buffer = bytearray(MatchboxStore.bufferSize)
+		self.buffer = buffer
+		view = memoryview(buffer)
+		self.beads = view[:MatchboxStore.beadsSize].cast('i')
+		self.present = view[MatchboxStore.beadsSize:MatchboxStore.bufferSize]
+		self.cumulative = [None] * numRows
+		self.readOnly = readOnly
+		self.gameCount = 0
+		return
+
+	def __repr__(self):
+		return repr({index: list(matchbox) for index, matchbox in self.items()})
+
+	def __len__(self):
+		return sum(self.present)
+
+	def __contains__(self, index):
+		row = rowsOfIndices[index]
+		return row >= 0 and self.present[row] != 0
+
+	def __getitem__(self, index):
+		row = rowsOfIndices[index]
+		if row < 0 or not self.present[row]:
+			raise KeyError(index)
+		return self.beads[row*9:row*9 + 9]
+
+	def __setitem__(self, index, matchbox):
+		row = rowsOfIndices[index]
+		if row < 0:
+			raise KeyError(index)
+		start = row*9
+		for square in range(9):
+			self.beads[start + square] = matchbox[square]
+		self.present[row] = 1
+		self.cumulative[row] = None
+		return
+
+	def __iter__(self):
+		return self.keys()
+
+	def Row(self, index):
+		"""
+		The matchbox for the index, created with the default beads if
+		it is not there yet
+		"""
+		row = rowsOfIndices[index]
+		if row < 0:
+			raise KeyError(index)
+		if not self.present[row]:
+			if instrumented:
+				Count('MatchboxStore.Row misses')
+			if self.readOnly:
+				return DefaultMatchbox(index)
+			self[index] = DefaultMatchbox(index)
+		return self.beads[row*9:row*9 + 9]
+
+	def Cumulative(self, index):
+		"""
+		The running sums of the beads in the index's matchbox, the last
+		of which is the total. Built when first needed, and kept up to date
+		"""
+		row = rowsOfIndices[index]
+		cumulative = self.cumulative[row] if row >= 0 else None
+		if instrumented:
+			Count('MatchboxStore.Cumulative hits' if cumulative is not None else 'MatchboxStore.Cumulative misses')
+		if cumulative is None:
+			matchbox = self.Row(index)
+			cumulative = list(accumulate(matchbox))
+			self.cumulative[row] = cumulative
+		return cumulative
+
+	def Total(self, index):
+		return self.Cumulative(index)[8]
+
+	def AddBeads(self, index, square, count):
+		"""
+		Adds count beads (or removes them, if count is negative) to the square
+		"""
+		row = rowsOfIndices[index]
+		matchbox = self.Row(index)
+		matchbox[square] += count
+		cumulative = self.cumulative[row]
+		if cumulative is not None:
+			for later in range(square, 9):
+				cumulative[later] += count
+		return
+
+	@Timed
+	def PickSquare(self, index):
+		"""
+		Same as PickSquareAtRandom on the index's matchbox, but with the
+		running sums already on hand it is a single bisect
+		"""
+		cumulative = self.Cumulative(index)
+		return bisect(cumulative, random() * cumulative[8], 0, 8)
+
+	def keys(self):
+		for row, index in enumerate(matchboxIndices):
+			if self.present[row]:
+				yield index
+
+	def values(self):
+		for index in self.keys():
+			yield self[index]
+
+	def items(self):
+		for index in self.keys():
+			yield (index, self[index])
+
+	def CountGames(self, numGames):
+		self.gameCount += numGames
+		return
+
+	def LearnMove(self, index, square, count):
+		"""
+		Adds count beads to the square, as learning does, unless the
+		matchbox is down to its last bead. Beads are only taken away down
+		to none, so no square is ever left with fewer
+
+		returns False iff the matchbox was left alone
+		"""
+		cumulative = self.Cumulative(index)
+		if cumulative[8] == 1:
+			# There is only one bead left in the matchbox. Don't remove it!
+			return False
+		if count < 0:
+			beads = cumulative[square] - cumulative[square - 1] if square > 0 else cumulative[0]
+			count = max(count, -beads)
+		if count != 0:
+			self.AddBeads(index, square, count)
+		return True
+
+	def ApplyDelta(self, index, delta):
+		"""
+		Adds a change to each square of the matchbox, as ApplyMatchboxDeltas does
+		"""
+		matchbox = self.Row(index)
+		delta = [max(change, -matchbox[square]) for square, change in enumerate(delta)]
+		if self.Total(index) + sum(delta) < 1:
+			delta = [max(change, 0) for change in delta]
+		for square in range(9):
+			if delta[square]:
+				self.AddBeads(index, square, delta[square])
+		return
+
+	def ForgetCumulative(self, rows):
+		"""
+		Drops the cached running sums of the rows, after their beads were
+		changed some other way than AddBeads
+		"""
+		for row in rows:
+			self.cumulative[row] = None
+		return
+
+	def Clear(self):
+		self.present[:] = bytes(numRows)
+		self.beads[:] = array('i', bytes(MatchboxStore.beadsSize))
+		self.cumulative = [None] * numRows
+		self.gameCount = 0
+		return
+
+
+matchboxes = MatchboxStore()
 seed()
 
 def DefaultMatchbox(index):
@@ -20,13 +230,12 @@ def DefaultMatchbox(index):
 	The default will have 0.0 probability for every occupied square,
 	and 1.0 probability for every empty square
 	"""
-	board = BoardFromIndex(index)
-	matchbox = []
-	for row in range(3):
-		for col in range(3):
-			matchbox.append(5 if board[row][col] == ' ' else 0)
+	matchbox = [0] * 9
+	for square in EmptySquares(index):
+		matchbox[square] = defaultBeads
 	return matchbox
 
+@Timed
 def PickSquareAtRandom(matchbox):
 	"""
 	Picks one of the squares from the matchbox
@@ -46,12 +255,15 @@ def GetComputerMove(board, index, mover):
 	First looks up the index in matchboxes. If it is there, 
 	returns the value. Otherwise it returns a new, default matchbox.
 	"""
-	if index in matchboxes:
-		matchbox = matchboxes[index]
-	else:
-		matchbox = DefaultMatchbox(index)
-		matchboxes[index] = matchbox
-	return PickSquareAtRandom(matchbox)
+	return GetComputerMoveForIndex(index)
+
+
+@Timed
+def GetComputerMoveForIndex(index):
+	"""
+	Same as GetComputerMove, when all that is known is the board's index
+	"""
+	return matchboxes.PickSquare(index)
 
 
 def LearnFromGames(game):
@@ -59,28 +271,37 @@ def LearnFromGames(game):
 	Takes a list of strings for the game, and updates the matchboxes
 	for the moves that the winner or loser took. No change if the game
 	was a cat's game.
+
+	The games are parsed and learned one at a time, so game can also be
+	an open file of any size
 	"""
-	parsedGames = ParseGames(game)
+	LearnFromParsedGames(IterParseGames(game))
+	return
+
+
+@Timed
+def LearnFromParsedGames(parsedGames, store=None):
+	"""
+	Same as LearnFromGames, for games that are already parsed
+
+	store is the matchboxes to learn in, defaulting to matchboxes. Any
+	store with CountGames and LearnMove will do
+	"""
+	if store is None:
+		store = matchboxes
 	for parsedGame in parsedGames:
+		store.CountGames(1)
 		if parsedGame.winner != 'C':
 			winner = parsedGame.winner
 			for move in parsedGame.moves:
-				if move.index in matchboxes:
-					matchbox = matchboxes[move.index]
-				else:
-					matchbox = DefaultMatchbox(move.index)
-				if sum(matchbox) == 1:
-					# There is only one bead left in the matchbox. Don't remove it!
+				weightIncrement = winBeads if move.mover == winner else -lossBeads
+				if not store.LearnMove(move.index, move.square, weightIncrement):
 					break
-				weightIncrement = 1 if move.mover == winner else -1
-				matchbox[move.square] += weightIncrement
-				matchboxes[move.index] = matchbox
 	return
 
 
 def ClearMatchboxes():
-	global matchboxes
-	matchboxes = {}
+	matchboxes.Clear()
 	return
 
 
@@ -88,6 +309,81 @@ def GetMatchboxes():
 	return matchboxes
 
 
+def UseMatchboxes(store):
+	"""
+	Makes store the matchboxes that are played and learned from, such as
+	a store shared with other processes
+
+	returns the store it replaces
+	"""
+	global matchboxes
+	previous = matchboxes
+	matchboxes = store
+	return previous
+
+
+def SnapshotMatchboxes():
+	"""
+	Copies the matchboxes into a plain dict of lists, which can be
+	handed to another process
+	"""
+	return {index: list(matchbox) for index, matchbox in matchboxes.items()}
+
+
+def LoadMatchboxes(snapshot):
+	"""
+	Replaces the matchboxes with a copy of the snapshot
+	"""
+	matchboxes.Clear()
+	for index, matchbox in snapshot.items():
+		matchboxes[index] = matchbox
+	return
+
+
+def MatchboxDeltas(snapshot):
+	"""
+	The beads added and removed since the snapshot was taken, as a dict
+	of index to a list of 9 changes. Matchboxes that were created since
+	are compared against their default
+	"""
+	deltas = {}
+	for index, matchbox in matchboxes.items():
+		before = snapshot[index] if index in snapshot else DefaultMatchbox(index)
+		delta = [after - was for after, was in zip(matchbox, before)]
+		if any(delta):
+			deltas[index] = delta
+	return deltas
+
+
+def MergeMatchboxDeltas(merged, deltas):
+	"""
+	Adds deltas into merged
+	"""
+	for index, delta in deltas.items():
+		if index in merged:
+			total = merged[index]
+			for square in range(9):
+				total[square] += delta[square]
+		else:
+			merged[index] = list(delta)
+	return
+
+
+def ApplyMatchboxDeltas(deltas, numGames=0):
+	"""
+	Adds the deltas to the matchboxes. As with learning, beads are only
+	taken from a square down to none, and a matchbox is never left
+	without a bead, so if the removals would empty it only the additions
+	are applied
+
+	numGames is the number of games the deltas were learned from
+	"""
+	matchboxes.CountGames(numGames)
+	for index, delta in deltas.items():
+		matchboxes.ApplyDelta(index, delta)
+	return
+
+
 class ParsedMove:
 	"""
 	A single move of a game, with it's board index, the mover, and the chosen square
@@ -123,10 +419,24 @@ def ParseGames(gameList):
 	Then a move is an 'I' line followed by a 'M' line
 	Board transformation lines are ignored
 	"""
-	games = []
+	return list(IterParseGames(gameList))
+
+
+def IterParseGames(lines):
+	"""
+	Same as ParseGames, but hands back each game as soon as its last line
+	is read, so only one game is held at a time. lines can be any iterable,
+	including an open file. It can also be a log with its own Games
+	method, such as a gamelog.BinaryGameLog, whose games are handed back
+	"""
+	if hasattr(lines, 'Games'):
+		yield from lines.Games()
+		return
 	game = ParsedGame()
-	for line in gameList:
-		tokens = line.split(' ')
+	for line in lines:
+		tokens = line.split()
+		if not tokens:
+			continue
 		if tokens[0] == 'I':
 			index = int(tokens[1])
 		elif tokens[0] == 'M':
@@ -134,12 +444,27 @@ def ParseGames(gameList):
 			game.moves.append(ParsedMove(index, mover, int(square)))
 		elif tokens[0] == 'C':
 			game.winner = 'C'
-			games.append(game)
+			yield game
 			game = ParsedGame()
 		elif tokens[0] == 'W':
 			game.winner = tokens[1]
-			games.append(game)
+			yield game
 			game = ParsedGame()
-	return games
+	return
 
 
+@Timed
+def LinesFromParsedGame(parsedGame):
+	"""
+	Writes a parsed game back out as the lines that ParseGames reads.
+	Board transformation lines are not needed, so they are left out
+	"""
+	lines = []
+	for move in parsedGame.moves:
+		lines.append('I {}'.format(move.index))
+		lines.append('M {} {}'.format(move.mover, move.square))
+	if parsedGame.winner == 'C':
+		lines.append('C')
+	else:
+		lines.append('W {}'.format(parsedGame.winner))
+	return lines
@@ -0,0 +1,356 @@
+"""
+mnk.py
+
+An engine for the m,n,k games, Tic-Tac-Toe on a board with any number of
+rows and columns, won by k in a row. Tic-Tac-Toe itself is the 3,3,3 game
+
+The squares are numbered across the rows, as on the 3x3 board, and the
+masks, index and symmetries follow the same rules as bitboard.py,
+statetable.py and symmetry.py. Indices are Python integers, so they
+carry on growing with the board. Nothing is tabulated per index, since
+there are far too many of them past 3x3; instead, a position keeps its
+masks up to date and only checks the lines through the last move
+
+MnkMatchboxes keeps the matchboxes that have been visited in a dict, and
+has the same Total, AddBeads and PickSquare as MatchboxStore, so that
+LearnFromParsedGames and PlayGame work on it unchanged
+"""
+
+from bisect import bisect
+from itertools import accumulate
+from random import random
+
+from matchbox import defaultBeads
+
+
+teamValues = {'X': 2, 'O': 1}
+
+
+def BuildLineMasks(rows, columns, k):
+	"""
+	The masks of every k in a row, across, down and on both diagonals
+	"""
+	directions = ((0, 1), (1, 0), (1, 1), (1, -1))
+	lines = []
+	for row in range(rows):
+		for column in range(columns):
+			for rowStep, columnStep in directions:
+				lastRow = row + rowStep*(k - 1)
+				lastColumn = column + columnStep*(k - 1)
+				if not (0 <= lastRow < rows and 0 <= lastColumn < columns):
+					continue
+				mask = 0
+				for step in range(k):
+					mask |= 1 << ((row + rowStep*step)*columns + column + columnStep*step)
+				lines.append(mask)
+	return tuple(lines)
+
+
+def BuildSquarePermutations(rows, columns):
+	"""
+	For each symmetry of the board, the permutation that maps each new
+	square onto the old square it came from, as squarePermutations does
+
+	Symmetries are numbered flips*4 + rotations, flipping first and then
+	rotating clockwise. A board that is not square only has the half
+	turns, so it has 4 symmetries rather than 8
+
+	returns a tuple of (symmetry, permutation) tuples
+	"""
+	def Rotate(permutation):
+		# The new square at (row, column) is the old one at (size-1-column, row)
+		return tuple(permutation[(rows - 1 - (square % columns))*columns + square // columns]
+				for square in range(rows*columns))
+
+	def HalfTurn(permutation):
+		return tuple(permutation[rows*columns - 1 - square] for square in range(rows*columns))
+
+	def Flip(permutation):
+		return tuple(permutation[(square // columns)*columns + columns - 1 - square % columns]
+				for square in range(rows*columns))
+
+	identity = tuple(range(rows*columns))
+	permutations = []
+	for flips in range(2):
+		permutation = Flip(identity) if flips else identity
+		if rows == columns:
+			for rotations in range(4):
+				permutations.append((flips*4 + rotations, permutation))
+				permutation = Rotate(permutation)
+		else:
+			permutations.append((flips*4, permutation))
+			permutations.append((flips*4 + 2, HalfTurn(permutation)))
+	return tuple(permutations)
+
+
+class MnkBoard:
+	"""
+	The shape of an m,n,k game, and the tables worked out from it
+
+	rows and columns are the size of the board, and k is the number in
+	a row that wins
+	"""
+	def __init__(self, rows=3, columns=3, k=3):
+		if not (0 < k <= max(rows, columns)):
+			raise ValueError(f'Cannot get {k} in a row on a {rows}x{columns} board')
+		self.rows = rows
+		self.columns = columns
+		self.k = k
+		self.numSquares = rows*columns
+		self.fullMask = (1 << self.numSquares) - 1
+		self.numIndices = 3**self.numSquares
+		self.squarePowers = tuple(3**(self.numSquares - 1 - square) for square in range(self.numSquares))
+		self.lineMasks = BuildLineMasks(rows, columns, k)
+		self.linesThroughSquares = tuple(tuple(line for line in self.lineMasks if line & (1 << square))
+				for square in range(self.numSquares))
+		self.squarePermutations = BuildSquarePermutations(rows, columns)
+		self.inversePermutations = {}
+		for symmetry, permutation in self.squarePermutations:
+			inverse = [0] * self.numSquares
+			for newSquare, oldSquare in enumerate(permutation):
+				inverse[oldSquare] = newSquare
+			self.inversePermutations[symmetry] = tuple(inverse)
+		return
+
+	def __repr__(self):
+		return f'MnkBoard({self.rows}, {self.columns}, {self.k})'
+
+	def IsWinningMask(self, mask):
+		for line in self.lineMasks:
+			if mask & line == line:
+				return True
+		return False
+
+	def IsWinningMove(self, mask, square):
+		"""
+		Checks only the lines through square, which has just been played
+		"""
+		for line in self.linesThroughSquares[square]:
+			if mask & line == line:
+				return True
+		return False
+
+	def IndexFromMasks(self, xMask, oMask):
+		index = 0
+		for square in range(self.numSquares):
+			bit = 1 << square
+			index = index*3 + (2 if xMask & bit else 1 if oMask & bit else 0)
+		return index
+
+	def MasksFromIndex(self, index):
+		"""
+		returns a tuple of (xMask, oMask)
+		"""
+		if not (0 <= index < self.numIndices):
+			raise ValueError(f'Index {index} is out of range for {self!r}')
+		xMask = 0
+		oMask = 0
+		for square in reversed(range(self.numSquares)):
+			index, value = divmod(index, 3)
+			if value == 2:
+				xMask |= 1 << square
+			elif value == 1:
+				oMask |= 1 << square
+		return (xMask, oMask)
+
+	def EmptyMask(self, index):
+		xMask, oMask = self.MasksFromIndex(index)
+		return self.fullMask & ~(xMask | oMask)
+
+	def IndexBoard(self, board):
+		"""
+		The index of a double list board, as with IndexBoard
+		"""
+		index = 0
+		for row in board:
+			for square in row:
+				index = index*3 + teamValues.get(square, 0)
+		return index
+
+	def BoardFromIndex(self, index):
+		xMask, oMask = self.MasksFromIndex(index)
+		return [['X' if xMask & (1 << square) else 'O' if oMask & (1 << square) else ' '
+				for square in range(row*self.columns, (row + 1)*self.columns)]
+				for row in range(self.rows)]
+
+	def TransformIndex(self, index, symmetry):
+		"""
+		The index of the board after the symmetry, as with TransformIndex
+		"""
+		xMask, oMask = self.MasksFromIndex(index)
+		return self.TransformedIndex(xMask, oMask, dict(self.squarePermutations)[symmetry])
+
+	def TransformedIndex(self, xMask, oMask, permutation):
+		index = 0
+		for oldSquare in permutation:
+			bit = 1 << oldSquare
+			index = index*3 + (2 if xMask & bit else 1 if oMask & bit else 0)
+		return index
+
+	def TransformSquare(self, square, symmetry):
+		"""
+		Where square ends up after the symmetry
+		"""
+		return self.inversePermutations[symmetry][square]
+
+	def CanonicalizeMasks(self, xMask, oMask):
+		"""
+		Finds the symmetry with the largest index, taking the first one
+		on a tie, as CanonicalizeIndex does
+
+		returns a tuple of (index, symmetry)
+		"""
+		bestIndex = -1
+		bestSymmetry = 0
+		for symmetry, permutation in self.squarePermutations:
+			index = self.TransformedIndex(xMask, oMask, permutation)
+			if index > bestIndex:
+				bestIndex = index
+				bestSymmetry = symmetry
+		return (bestIndex, bestSymmetry)
+
+	def CanonicalIndex(self, index):
+		xMask, oMask = self.MasksFromIndex(index)
+		return self.CanonicalizeMasks(xMask, oMask)[0]
+
+
+class MnkPosition:
+	"""
+	A position on an MnkBoard, with the same fields and methods as Position,
+	so that PlayGame can play it out
+	"""
+	def __init__(self, board, index=0):
+		self.board = board
+		self.index = index
+		self.xMask, self.oMask = board.MasksFromIndex(index)
+		self.numX = bin(self.xMask).count('1')
+		self.numO = bin(self.oMask).count('1')
+		self.lastMove = None
+		self.winner = ('X' if board.IsWinningMask(self.xMask) else
+				'O' if board.IsWinningMask(self.oMask) else None)
+		return
+
+	def __str__(self):
+		return f'Index: {self.index}, X: {self.numX}, O: {self.numO}, Last: {self.lastMove}'
+
+	def Mover(self):
+		return 'X' if self.numX == self.numO else 'O'
+
+	def Move(self, team, move):
+		"""
+		Makes the move for the team, and checks the lines through
+		the square for a win
+		"""
+		bit = 1 << move
+		if (self.xMask | self.oMask) & bit:
+			raise ValueError(f'Square {move} is occupied')
+		self.index += teamValues[team] * self.board.squarePowers[move]
+		if team == 'X':
+			self.xMask |= bit
+			self.numX += 1
+			mask = self.xMask
+		else:
+			self.oMask |= bit
+			self.numO += 1
+			mask = self.oMask
+		self.lastMove = move
+		if self.board.IsWinningMove(mask, move):
+			self.winner = team
+		return
+
+	def IsCatsGame(self):
+		return self.winner is None and self.numX + self.numO == self.board.numSquares
+
+	def IsOver(self):
+		return self.winner is not None or self.numX + self.numO == self.board.numSquares
+
+	def Canonicalize(self):
+		"""
+		Moves the position onto its canonical board
+
+		returns a tuple of (rotations, flips)
+		"""
+		index, symmetry = self.board.CanonicalizeMasks(self.xMask, self.oMask)
+		if symmetry != 0:
+			self.index = index
+			self.xMask, self.oMask = self.board.MasksFromIndex(index)
+			if self.lastMove is not None:
+				self.lastMove = self.board.TransformSquare(self.lastMove, symmetry)
+		return (symmetry % 4, symmetry // 4)
+
+	def Board(self):
+		return self.board.BoardFromIndex(self.index)
+
+
+class MnkMatchboxes:
+	"""
+	The matchboxes for an MnkBoard, kept only for the boards that come up.
+	Each one is a list with a bead count for every square, and its running
+	sums are kept alongside for picking
+	"""
+	def __init__(self, board):
+		self.board = board
+		self.matchboxes = {}
+		self.cumulative = {}
+		self.gameCount = 0
+		return
+
+	def __len__(self):
+		return len(self.matchboxes)
+
+	def __contains__(self, index):
+		return index in self.matchboxes
+
+	def __getitem__(self, index):
+		return self.matchboxes[index]
+
+	def DefaultMatchbox(self, index):
+		emptyMask = self.board.EmptyMask(index)
+		return [defaultBeads if emptyMask & (1 << square) else 0 for square in range(self.board.numSquares)]
+
+	def Row(self, index):
+		matchbox = self.matchboxes.get(index)
+		if matchbox is None:
+			matchbox = self.DefaultMatchbox(index)
+			self.matchboxes[index] = matchbox
+		return matchbox
+
+	def Cumulative(self, index):
+		cumulative = self.cumulative.get(index)
+		if cumulative is None:
+			cumulative = list(accumulate(self.Row(index)))
+			self.cumulative[index] = cumulative
+		return cumulative
+
+	def Total(self, index):
+		return self.Cumulative(index)[-1]
+
+	def AddBeads(self, index, square, count):
+		self.Row(index)[square] += count
+		cumulative = self.cumulative.get(index)
+		if cumulative is not None:
+			for later in range(square, len(cumulative)):
+				cumulative[later] += count
+		return
+
+	def CountGames(self, numGames):
+		self.gameCount += numGames
+		return
+
+	def LearnMove(self, index, square, count):
+		if self.Total(index) == 1:
+			return False
+		count = max(count, -self.Row(index)[square])
+		if count != 0:
+			self.AddBeads(index, square, count)
+		return True
+
+	def PickSquare(self, index):
+		cumulative = self.Cumulative(index)
+		return bisect(cumulative, random() * cumulative[-1], 0, len(cumulative) - 1)
+
+	def Clear(self):
+		self.matchboxes.clear()
+		self.cumulative.clear()
+		self.gameCount = 0
+		return
@@ -0,0 +1,90 @@
+"""
+parallel.py
+
+Spreads self play training over a pool of processes
+
+Each round, every worker is handed a snapshot of the matchboxes and a
+share of the games. The worker plays and learns on its own copy, then
+sends back the beads it added and removed. The deltas from all the
+workers are summed and applied to the matchboxes before the next round
+"""
+
+from multiprocessing import Pool
+from multiprocessing import cpu_count
+from time import perf_counter
+
+from matchbox import MatchboxStore
+from matchbox import UseMatchboxes
+from matchbox import SnapshotMatchboxes
+from matchbox import LoadMatchboxes
+from matchbox import MatchboxDeltas
+from matchbox import MergeMatchboxDeltas
+from matchbox import ApplyMatchboxDeltas
+from selfplay import SelfPlay
+from selfplay import SelfPlayResults
+
+
+def UsePrivateMatchboxes():
+	"""
+	Runs as each worker process starts. A forked worker would otherwise
+	load its snapshots into the parent's matchboxes, which may be shared
+	with other processes (see sharedstore.py)
+	"""
+	UseMatchboxes(MatchboxStore())
+	return
+
+
+def TrainShare(task):
+	"""
+	Runs in a worker process
+
+	task is a tuple of (snapshot, numGames)
+
+	returns a tuple of (deltas, results)
+	"""
+	snapshot, numGames = task
+	LoadMatchboxes(snapshot)
+	results = SelfPlay(numGames, learn=True)
+	return (MatchboxDeltas(snapshot), results)
+
+
+def SplitGames(numGames, numShares):
+	"""
+	Splits numGames as evenly as possible, leaving out empty shares
+	"""
+	share, extra = divmod(numGames, numShares)
+	shares = [share + 1 if worker < extra else share for worker in range(numShares)]
+	return [share for share in shares if share > 0]
+
+
+def ParallelSelfPlay(numGames, numWorkers=None, syncInterval=10000):
+	"""
+	Plays numGames of self play across numWorkers processes, and learns from them
+
+	numWorkers defaults to the number of cores
+	syncInterval is the number of games played between merges. Smaller
+		intervals keep the workers closer to the latest matchboxes, larger
+		ones spend less time copying them around
+
+	returns the SelfPlayResults for the whole run
+	"""
+	if numWorkers is None:
+		numWorkers = cpu_count()
+
+	results = SelfPlayResults()
+	start = perf_counter()
+	with Pool(numWorkers, initializer=UsePrivateMatchboxes) as pool:
+		remaining = numGames
+		while remaining > 0:
+			roundGames = min(syncInterval, remaining)
+			snapshot = SnapshotMatchboxes()
+			tasks = [(snapshot, share) for share in SplitGames(roundGames, numWorkers)]
+
+			merged = {}
+			for deltas, workerResults in pool.imap_unordered(TrainShare, tasks):
+				MergeMatchboxDeltas(merged, deltas)
+				results.Merge(workerResults)
+			ApplyMatchboxDeltas(merged, roundGames)
+			remaining -= roundGames
+	results.seconds = perf_counter() - start
+	return results
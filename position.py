@@ -0,0 +1,110 @@
+"""
+position.py
+
+A Tic-Tac-Toe position that keeps its index, team masks and piece
+counts up to date as moves are made, instead of rescanning the board
+"""
+
+from bitboard import CountMask
+from bitboard import IsWinningMove
+from statetable import MasksFromIndex
+from statetable import IsWinnerIndex
+from statetable import LegalMoves
+from statetable import IsToMoveIndex
+from symmetry import CanonicalSymmetry
+from symmetry import TransformIndex
+from symmetry import TransformSquare
+from TicTacToe import ValidateMoveForIndex
+from TicTacToe import BoardFromIndex
+from instrument import Timed
+
+
+# The amount a piece in each square adds to the index, per unit of value
+squarePowers = tuple(3**(8 - square) for square in range(9))
+teamValues = {'X': 2, 'O': 1}
+
+
+def ChildIndex(index, square):
+	"""
+	The index after the team to move plays square
+	"""
+	value = 2 if IsToMoveIndex(index, 'X') else 1
+	return index + value * squarePowers[square]
+
+
+class Position:
+	"""
+	index is the base 3 index of the board, as with IndexBoard
+	xMask and oMask are the bitboards of each team
+	numX and numO are the piece counts
+	lastMove is the square last played, None at the start
+	winner is the team that has won, None until someone does
+	"""
+	def __init__(self, index=0):
+		self.index = index
+		self.xMask, self.oMask = MasksFromIndex(index)
+		self.numX = CountMask(self.xMask)
+		self.numO = CountMask(self.oMask)
+		self.lastMove = None
+		self.winner = 'X' if IsWinnerIndex(index, 'X') else 'O' if IsWinnerIndex(index, 'O') else None
+		return
+
+	def __str__(self):
+		return f'Index: {self.index}, X: {self.numX}, O: {self.numO}, Last: {self.lastMove}'
+
+	def Mover(self):
+		"""
+		The team whose turn it is
+		"""
+		return 'X' if self.numX == self.numO else 'O'
+
+	def LegalMoves(self):
+		return LegalMoves(self.index)
+
+	def ValidateMove(self, team, move):
+		return ValidateMoveForIndex(self.index, team, move)
+
+	@Timed
+	def Move(self, team, move):
+		"""
+		Makes the move for the team, and checks the lines through
+		the square for a win
+		"""
+		bit = 1 << move
+		self.index += teamValues[team] * squarePowers[move]
+		if team == 'X':
+			self.xMask |= bit
+			self.numX += 1
+			mask = self.xMask
+		else:
+			self.oMask |= bit
+			self.numO += 1
+			mask = self.oMask
+		self.lastMove = move
+		if IsWinningMove(mask, move):
+			self.winner = team
+		return
+
+	def IsCatsGame(self):
+		return self.winner is None and self.numX == 5
+
+	def IsOver(self):
+		return self.winner is not None or self.numX == 5
+
+	@Timed
+	def Canonicalize(self):
+		"""
+		Moves the position onto its canonical board, as CanonicalizeBoard does
+
+		returns a tuple of (rotations, flips)
+		"""
+		symmetry = CanonicalSymmetry(self.index)
+		if symmetry != 0:
+			self.index = TransformIndex(self.index, symmetry)
+			self.xMask, self.oMask = MasksFromIndex(self.index)
+			if self.lastMove is not None:
+				self.lastMove = TransformSquare(self.lastMove, symmetry)
+		return (symmetry % 4, symmetry // 4)
+
+	def Board(self):
+		return BoardFromIndex(self.index)
@@ -0,0 +1,119 @@
+"""
+selfplay.py
+
+Plays computer vs computer games with no printing and no game log
+strings, for training runs that are too long to watch
+"""
+
+from time import perf_counter
+
+from position import Position
+from matchbox import GetComputerMoveForIndex
+from matchbox import LearnFromParsedGames
+from matchbox import ParsedGame
+from matchbox import ParsedMove
+from instrument import Timed
+
+
+@Timed
+def PlayGame(players, position=None):
+	"""
+	Plays one game out, canonicalizing the board after every move the
+	same way PlayTicTacToe does
+
+	players maps each team onto a function that takes the board index
+		and returns the square to play
+	position is where the game starts, defaulting to an empty Position.
+		Anything with the same index, Move, Canonicalize, winner and
+		IsCatsGame will do, such as an MnkPosition
+
+	returns the ParsedGame
+	"""
+	if position is None:
+		position = Position()
+	game = ParsedGame()
+	mover = 'X'
+	while True:
+		index = position.index
+		square = players[mover](index)
+		position.Move(mover, square)
+		game.moves.append(ParsedMove(index, mover, square))
+		position.Canonicalize()
+
+		if position.winner is not None:
+			game.winner = mover
+			return game
+
+		if position.IsCatsGame():
+			game.winner = 'C'
+			return game
+
+		mover = 'O' if mover == 'X' else 'X'
+
+
+class SelfPlayResults:
+	"""
+	The tally of a self play run
+
+	games holds the ParsedGames if they were kept, otherwise it is empty
+	"""
+	def __init__(self):
+		self.numGames = 0
+		self.xWins = 0
+		self.oWins = 0
+		self.catsGames = 0
+		self.seconds = 0.0
+		self.games = []
+		return
+
+	def __str__(self):
+		return (f'Games: {self.numGames}, X: {self.xWins}, O: {self.oWins}, ' +
+				f"Cat's: {self.catsGames}, Games/sec: {self.GamesPerSecond():.0f}")
+
+	def Tally(self, game):
+		self.numGames += 1
+		if game.winner == 'X':
+			self.xWins += 1
+		elif game.winner == 'O':
+			self.oWins += 1
+		else:
+			self.catsGames += 1
+		return
+
+	def Merge(self, other):
+		"""
+		Adds the tally of other into this one. The time is left alone,
+		since runs that are merged usually ran side by side
+		"""
+		self.numGames += other.numGames
+		self.xWins += other.xWins
+		self.oWins += other.oWins
+		self.catsGames += other.catsGames
+		self.games.extend(other.games)
+		return
+
+	def GamesPerSecond(self):
+		return self.numGames / self.seconds if self.seconds > 0 else 0.0
+
+
+def SelfPlay(numGames, learn=True, keepGames=False):
+	"""
+	Plays numGames of the matchboxes against themselves
+
+	learn is True to update the matchboxes after every game, as the Learn command does
+	keepGames is True to hold on to every ParsedGame in the results
+
+	returns the SelfPlayResults
+	"""
+	players = {'X': GetComputerMoveForIndex, 'O': GetComputerMoveForIndex}
+	results = SelfPlayResults()
+	start = perf_counter()
+	for _ in range(numGames):
+		game = PlayGame(players)
+		if learn:
+			LearnFromParsedGames((game,))
+		if keepGames:
+			results.games.append(game)
+		results.Tally(game)
+	results.seconds = perf_counter() - start
+	return results
@@ -0,0 +1,296 @@
+"""
+server.py
+
+Hosts many games of Tic-Tac-Toe at once over TCP or a Unix socket,
+all played by the one shared set of matchboxes. Finished games are
+learned from in batches
+
+The protocol is one line per request and one line per reply
+
+	NEW X | NEW O	Starts a game, with the client playing that team
+	MOVE {square}	Plays the square on the board from the last reply
+	QUIT			Closes the connection
+
+	OK {index}				Your move, on the board with this index
+	MOVED {square} {index}	The computer played square, then the board was
+							canonicalized to index. Your move
+	END {result} {square} {index}	The game is over. result is X, O, or C for a
+							cat's game. square is the computer's last move,
+							or - if the client's move ended the game
+	ERR {reason}			The request was not understood or the move was
+							not valid. The game carries on
+
+As with PlayTicTacToe, the board is canonicalized after every move, so
+squares are always on the board with the index in the last reply
+
+Command Line: python server.py serve [--host HOST] [--port PORT] [--unix PATH]
+              python server.py load [--clients N] [--games N] [--host HOST] [--port PORT] [--unix PATH]
+"""
+
+import argparse
+import asyncio
+from random import choice
+from time import perf_counter
+
+from TicTacToe import MoveValidation
+from statetable import LegalMoves
+from position import Position
+from matchbox import GetComputerMoveForIndex
+from matchbox import LearnFromParsedGames
+from matchbox import ParsedGame
+from matchbox import ParsedMove
+
+
+defaultPort = 8642
+listenBacklog = 4096
+
+
+class Session:
+	"""
+	One client's game in progress
+	"""
+	def __init__(self, humanTeam):
+		self.humanTeam = humanTeam
+		self.computerTeam = 'O' if humanTeam == 'X' else 'X'
+		self.position = Position()
+		self.game = ParsedGame()
+		return
+
+	def Play(self, team, square):
+		"""
+		Makes the move and canonicalizes the board
+
+		returns True iff the game is over
+		"""
+		self.game.moves.append(ParsedMove(self.position.index, team, square))
+		self.position.Move(team, square)
+		self.position.Canonicalize()
+		if self.position.winner is not None:
+			self.game.winner = team
+			return True
+		if self.position.IsCatsGame():
+			self.game.winner = 'C'
+			return True
+		return False
+
+	def ComputerMove(self):
+		"""
+		returns a tuple of (square, True iff the game is over)
+		"""
+		square = GetComputerMoveForIndex(self.position.index)
+		return (square, self.Play(self.computerTeam, square))
+
+
+class GameServer:
+	"""
+	learnBatchSize is the number of finished games that triggers learning
+	learnInterval is the longest, in seconds, a finished game waits to be learned
+	"""
+	def __init__(self, learnBatchSize=100, learnInterval=1.0):
+		self.learnBatchSize = learnBatchSize
+		self.learnInterval = learnInterval
+		self.finishedGames = []
+		self.numSessions = 0
+		self.numGamesLearned = 0
+		self.server = None
+		self.flushTask = None
+		return
+
+	def Learn(self):
+		"""
+		Learns from all of the finished games in one go
+		"""
+		if self.finishedGames:
+			games = self.finishedGames
+			self.finishedGames = []
+			LearnFromParsedGames(games)
+			self.numGamesLearned += len(games)
+		return
+
+	def FinishGame(self, session):
+		self.finishedGames.append(session.game)
+		if len(self.finishedGames) >= self.learnBatchSize:
+			self.Learn()
+		return
+
+	def EndReply(self, session, square):
+		self.FinishGame(session)
+		return 'END {} {} {}'.format(session.game.winner, square, session.position.index)
+
+	def Reply(self, session, line):
+		"""
+		Works out the reply to one request
+
+		returns a tuple of (reply, session), where session is the game in
+		progress afterwards, if any
+		"""
+		tokens = line.split()
+		if not tokens:
+			return ('ERR Empty', session)
+
+		if tokens[0] == 'NEW' and len(tokens) == 2 and tokens[1] in ('X', 'O'):
+			session = Session(tokens[1])
+			if session.computerTeam == 'X':
+				square, _ = session.ComputerMove()
+				return ('MOVED {} {}'.format(square, session.position.index), session)
+			return ('OK {}'.format(session.position.index), session)
+
+		if tokens[0] == 'MOVE' and len(tokens) == 2:
+			if session is None:
+				return ('ERR NoGame', session)
+			try:
+				square = int(tokens[1])
+			except ValueError:
+				return ('ERR {}'.format(MoveValidation.OutOfRange.name), session)
+			result = session.position.ValidateMove(session.humanTeam, square)
+			if result != MoveValidation.Valid:
+				return ('ERR {}'.format(result.name), session)
+			if session.Play(session.humanTeam, square):
+				return (self.EndReply(session, '-'), None)
+			square, isOver = session.ComputerMove()
+			if isOver:
+				return (self.EndReply(session, square), None)
+			return ('MOVED {} {}'.format(square, session.position.index), session)
+
+		return ('ERR Unknown', session)
+
+	async def HandleClient(self, reader, writer):
+		self.numSessions += 1
+		session = None
+		try:
+			while True:
+				line = await reader.readline()
+				if not line or line.strip() == b'QUIT':
+					break
+				reply, session = self.Reply(session, line.decode('ascii', 'replace'))
+				writer.write(reply.encode('ascii') + b'\n')
+				await writer.drain()
+		except ConnectionError:
+			pass
+		finally:
+			writer.close()
+		return
+
+	async def FlushLearning(self):
+		while True:
+			await asyncio.sleep(self.learnInterval)
+			self.Learn()
+
+	async def Start(self, host='127.0.0.1', port=defaultPort, unixPath=None):
+		"""
+		Starts listening. Use port 0 to have one picked
+		"""
+		if unixPath is not None:
+			self.server = await asyncio.start_unix_server(self.HandleClient, unixPath, backlog=listenBacklog)
+		else:
+			self.server = await asyncio.start_server(self.HandleClient, host, port, backlog=listenBacklog)
+		self.flushTask = asyncio.create_task(self.FlushLearning())
+		return self.server
+
+	async def Stop(self):
+		self.flushTask.cancel()
+		self.server.close()
+		await self.server.wait_closed()
+		self.Learn()
+		return
+
+
+def Percentile(sortedValues, percent):
+	"""
+	The value below which percent of the sorted values fall
+	"""
+	if not sortedValues:
+		return 0.0
+	position = min(len(sortedValues) - 1, int(len(sortedValues) * percent / 100))
+	return sortedValues[position]
+
+
+async def OpenConnection(host, port, unixPath):
+	if unixPath is not None:
+		return await asyncio.open_unix_connection(unixPath)
+	return await asyncio.open_connection(host, port)
+
+
+async def RunClient(host, port, unixPath, numGames, latencies):
+	"""
+	Plays numGames as a client picking random squares, recording the
+	time each request took to answer
+
+	returns the number of games finished
+	"""
+	reader, writer = await OpenConnection(host, port, unixPath)
+	finished = 0
+	for gameNumber in range(numGames):
+		request = 'NEW X' if gameNumber % 2 == 0 else 'NEW O'
+		while True:
+			start = perf_counter()
+			writer.write(request.encode('ascii') + b'\n')
+			await writer.drain()
+			tokens = (await reader.readline()).decode('ascii').split()
+			latencies.append(perf_counter() - start)
+			if tokens[0] == 'END':
+				finished += 1
+				break
+			index = int(tokens[-1])
+			request = 'MOVE {}'.format(choice(LegalMoves(index)))
+	writer.write(b'QUIT\n')
+	await writer.drain()
+	writer.close()
+	return finished
+
+
+class LoadTestResults:
+	def __init__(self, numGames, latencies, seconds):
+		latencies = sorted(latencies)
+		self.numGames = numGames
+		self.numRequests = len(latencies)
+		self.seconds = seconds
+		self.p50 = Percentile(latencies, 50)
+		self.p99 = Percentile(latencies, 99)
+		return
+
+	def __str__(self):
+		return (f'Games: {self.numGames}, Requests: {self.numRequests}, ' +
+				f'Requests/sec: {self.numRequests / self.seconds:.0f}, ' +
+				f'p50: {1000 * self.p50:.2f} ms, p99: {1000 * self.p99:.2f} ms')
+
+
+async def LoadTest(numClients, gamesPerClient, host='127.0.0.1', port=defaultPort, unixPath=None):
+	"""
+	Runs numClients concurrent clients against a server
+
+	returns the LoadTestResults
+	"""
+	latencies = []
+	start = perf_counter()
+	finished = await asyncio.gather(*[RunClient(host, port, unixPath, gamesPerClient, latencies)
+			for _ in range(numClients)])
+	return LoadTestResults(sum(finished), latencies, perf_counter() - start)
+
+
+async def Serve(host, port, unixPath):
+	server = GameServer()
+	await server.Start(host, port, unixPath)
+	print('Serving, Professor')
+	await server.server.serve_forever()
+
+
+def Main():
+	parser = argparse.ArgumentParser(description='Serves Tic-Tac-Toe games, or load tests a server')
+	parser.add_argument('mode', choices=('serve', 'load'))
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=defaultPort)
+	parser.add_argument('--unix', default=None, help='a Unix socket path to use instead of TCP')
+	parser.add_argument('--clients', type=int, default=1000, help='concurrent clients for a load test')
+	parser.add_argument('--games', type=int, default=10, help='games per client for a load test')
+	arguments = parser.parse_args()
+
+	if arguments.mode == 'serve':
+		asyncio.run(Serve(arguments.host, arguments.port, arguments.unix))
+	else:
+		print(asyncio.run(LoadTest(arguments.clients, arguments.games, arguments.host, arguments.port, arguments.unix)))
+	return
+
+
+if __name__ == '__main__':
+	Main()
@@ -0,0 +1,186 @@
+"""
+sharedstore.py
+
+Keeps the matchboxes in a block of shared memory, so that many processes
+play from the one trained player. One process writes, learning as usual,
+and the others read, seeing each change as it is made, with nothing
+pickled or copied
+
+The block is a small header, followed by the matchbox store's buffer
+(see MatchboxStore)
+
+	magic		4 bytes, b'SMBX'
+	version		uint16
+	headerSize	uint16
+	numRows		uint32
+	(padding)	4 bytes
+	generation	uint64
+	gameCount	uint64
+
+generation goes up by one every time the writer changes the beads. A
+reader keeps the running sums of the rows it picks from, as any store
+does, and drops them all when it sees that generation has moved on. The
+counters and bead counts are in the machine's own order
+
+Processes should attach to a block that one of their parents created,
+so they all share its resource tracker
+"""
+
+import struct
+from multiprocessing.shared_memory import SharedMemory
+
+from matchbox import MatchboxStore
+from matchbox import GetMatchboxes
+from matchbox import UseMatchboxes
+from matchbox import numRows
+
+
+sharedMagic = b'SMBX'
+sharedVersion = 1
+sharedHeaderFormat = '<4sHHI4x'
+sharedHeaderSize = 32
+countersOffset = struct.calcsize(sharedHeaderFormat)
+sharedSize = sharedHeaderSize + MatchboxStore.bufferSize
+
+# The uint64 counters at the end of the header
+generationCounter = 0
+gameCountCounter = 1
+
+
+class SharedMatchboxStore(MatchboxStore):
+	"""
+	A matchbox store on a buffer that starts with the shared header, such as
+	the buf of a SharedMemory, or a map of a file
+
+	Matchboxes that the writer has not created yet are read as the default
+	matchbox by a read only store (see MatchboxStore)
+
+	Only one store on a buffer should write to it
+	"""
+	def __init__(self, buffer, readOnly=False, sharedMemory=None):
+		view = memoryview(buffer)
+		if readOnly:
+			view = view.toreadonly()
+		self.counters = view[countersOffset:sharedHeaderSize].cast('Q')
+		self.buffer = view[sharedHeaderSize:sharedSize]
+		self.beads = self.buffer[:MatchboxStore.beadsSize].cast('i')
+		self.present = self.buffer[MatchboxStore.beadsSize:MatchboxStore.bufferSize]
+		self.cumulative = [None] * numRows
+		self.generation = self.counters[generationCounter]
+		self.readOnly = readOnly
+		self.sharedMemory = sharedMemory
+		return
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception):
+		self.Close()
+		return False
+
+	@property
+	def gameCount(self):
+		return self.counters[gameCountCounter]
+
+	@gameCount.setter
+	def gameCount(self, count):
+		self.counters[gameCountCounter] = count
+
+	def Changed(self):
+		"""
+		Moves the generation on, after the beads were changed. The writer
+		keeps its own running sums up to date, so it keeps them
+		"""
+		self.generation = self.counters[generationCounter] + 1
+		self.counters[generationCounter] = self.generation
+		return
+
+	def __setitem__(self, index, matchbox):
+		MatchboxStore.__setitem__(self, index, matchbox)
+		self.Changed()
+		return
+
+	def Cumulative(self, index):
+		generation = self.counters[generationCounter]
+		if generation != self.generation:
+			self.cumulative = [None] * numRows
+			self.generation = generation
+		return MatchboxStore.Cumulative(self, index)
+
+	def AddBeads(self, index, square, count):
+		MatchboxStore.AddBeads(self, index, square, count)
+		self.Changed()
+		return
+
+	def ForgetCumulative(self, rows):
+		MatchboxStore.ForgetCumulative(self, rows)
+		self.Changed()
+		return
+
+	def Clear(self):
+		MatchboxStore.Clear(self)
+		self.Changed()
+		return
+
+	def Close(self):
+		"""
+		Lets go of the buffer, and closes the shared memory if the store has it.
+		The store can't be used after this
+		"""
+		self.counters.release()
+		self.beads.release()
+		self.present.release()
+		self.buffer.release()
+		if self.sharedMemory is not None:
+			self.sharedMemory.close()
+		return
+
+
+def CreateSharedMatchboxes(name=None):
+	"""
+	Creates a block of shared memory holding a copy of the current
+	matchboxes. The creator is the writer, and should unlink the block,
+	through its sharedMemory, once every process is done with it
+
+	name is the block's name, or None for a new unique one
+
+	returns the SharedMatchboxStore
+	"""
+	sharedMemory = SharedMemory(name=name, create=True, size=sharedSize)
+	sharedMemory.buf[:sharedHeaderSize] = bytes(sharedHeaderSize)
+	struct.pack_into(sharedHeaderFormat, sharedMemory.buf, 0,
+			sharedMagic, sharedVersion, sharedHeaderSize, numRows)
+	store = SharedMatchboxStore(sharedMemory.buf, sharedMemory=sharedMemory)
+	current = GetMatchboxes()
+	store.buffer[:] = current.buffer
+	store.gameCount = current.gameCount
+	return store
+
+
+def AttachSharedMatchboxes(name, readOnly=True):
+	"""
+	Attaches to the block of shared memory with this name
+
+	returns the SharedMatchboxStore
+	"""
+	sharedMemory = SharedMemory(name=name)
+	magic, version, headerSize, rows = struct.unpack_from(sharedHeaderFormat, sharedMemory.buf)
+	if magic != sharedMagic or version != sharedVersion or headerSize != sharedHeaderSize:
+		sharedMemory.close()
+		raise ValueError(f'{name} is not a version {sharedVersion} shared matchbox block')
+	if rows != numRows:
+		sharedMemory.close()
+		raise ValueError(f'{name} has {rows} matchboxes, expected {numRows}')
+	return SharedMatchboxStore(sharedMemory.buf, readOnly, sharedMemory)
+
+
+def UseSharedMatchboxes(name, readOnly=True):
+	"""
+	Attaches to the block and plays and learns from it, in place of this
+	process's own matchboxes
+
+	returns the SharedMatchboxStore
+	"""
+	store = AttachSharedMatchboxes(name, readOnly)
+	UseMatchboxes(store)
+	return store
@@ -0,0 +1,164 @@
+"""
+snapshot.py
+
+Saves and loads the matchboxes as a fixed layout binary file, so a
+trained player can start without replaying its games log
+
+The file is a header, followed by the matchbox store's buffer exactly
+as it sits in memory (see MatchboxStore)
+
+	magic			4 bytes, b'MBOX'
+	version			uint16
+	headerSize		uint16
+	defaultBeads	uint16
+	winBeads		uint16
+	lossBeads		uint16
+	(padding)		uint16
+	numRows			uint32
+	gameCount		uint64
+	logOffset		uint64
+	logFingerprint	16 bytes
+	(padding)		to headerSize
+
+logOffset is the byte offset in the games log up to which the games
+have been learned (see checkpoint.py), and is 0 when there is no log.
+logFingerprint identifies the log's bytes up to there, and is all 0
+when there is no log
+
+A snapshot is written to a temporary file that then replaces the old
+one, so a crash part way through never leaves half a snapshot behind
+
+All of the header is little endian, as are the bead counts, which are
+written in the machine's own order
+"""
+
+import mmap
+import os
+import struct
+
+import matchbox
+from matchbox import MatchboxStore
+from matchbox import GetMatchboxes
+
+
+snapshotMagic = b'MBOX'
+snapshotVersion = 1
+prefixFormat = '<4sHH'
+headerFormat = '<4sHHHHHxxIQQ16s'
+headerSize = 56
+fingerprintSize = 16
+noFingerprint = bytes(fingerprintSize)
+
+
+class SnapshotHeader:
+	"""
+	The fields of a snapshot file's header
+	"""
+	def __init__(self, version, size, defaultBeads, winBeads, lossBeads, numRows, gameCount, logOffset,
+			logFingerprint=noFingerprint):
+		self.version = version
+		self.size = size
+		self.defaultBeads = defaultBeads
+		self.winBeads = winBeads
+		self.lossBeads = lossBeads
+		self.numRows = numRows
+		self.gameCount = gameCount
+		self.logOffset = logOffset
+		self.logFingerprint = logFingerprint
+		return
+
+	def __str__(self):
+		return (f'Version: {self.version}, Beads: {self.defaultBeads} +{self.winBeads} -{self.lossBeads}, ' +
+				f'Games: {self.gameCount}, Log offset: {self.logOffset}')
+
+
+def PackHeader(gameCount, logOffset, logFingerprint=noFingerprint):
+	header = struct.pack(headerFormat, snapshotMagic, snapshotVersion, headerSize,
+			matchbox.defaultBeads, matchbox.winBeads, matchbox.lossBeads,
+			matchbox.numRows, gameCount, logOffset, logFingerprint)
+	return header.ljust(headerSize, b'\0')
+
+
+def UnpackHeader(data):
+	"""
+	Reads and checks the header at the start of data
+
+	Raises ValueError if this is not a snapshot this version of the
+	matchboxes can use
+	"""
+	if len(data) < struct.calcsize(prefixFormat):
+		raise ValueError('Snapshot is too short')
+	magic, version, size = struct.unpack_from(prefixFormat, data)
+	if magic != snapshotMagic:
+		raise ValueError('Not a matchbox snapshot')
+	if version != snapshotVersion or size != headerSize:
+		raise ValueError(f'Unknown snapshot version {version}')
+	if len(data) < size:
+		raise ValueError('Snapshot is too short')
+	fields = struct.unpack_from(headerFormat, data)
+	defaultBeads, winBeads, lossBeads, numRows, gameCount, logOffset, logFingerprint = fields[3:10]
+	if numRows != matchbox.numRows:
+		raise ValueError(f'Snapshot has {numRows} matchboxes, expected {matchbox.numRows}')
+	if (defaultBeads, winBeads, lossBeads) != (matchbox.defaultBeads, matchbox.winBeads, matchbox.lossBeads):
+		raise ValueError('Snapshot was trained with different bead counts')
+	if len(data) < size + MatchboxStore.bufferSize:
+		raise ValueError('Snapshot is too short')
+	return SnapshotHeader(version, size, defaultBeads, winBeads, lossBeads, numRows, gameCount, logOffset,
+			logFingerprint)
+
+
+def SaveMatchboxSnapshot(fileName, logOffset=0, logFingerprint=noFingerprint):
+	"""
+	Writes the current matchboxes to the file
+
+	logOffset is how far into the games log the matchboxes have learned
+	logFingerprint identifies the log up to there (see checkpoint.py)
+	"""
+	store = GetMatchboxes()
+	temporaryName = fileName + '.tmp'
+	try:
+		with open(temporaryName, 'wb') as file:
+			file.write(PackHeader(store.gameCount, logOffset, logFingerprint))
+			file.write(store.buffer)
+			file.flush()
+			os.fsync(file.fileno())
+		os.replace(temporaryName, fileName)
+	except BaseException:
+		if os.path.exists(temporaryName):
+			os.remove(temporaryName)
+		raise
+	return
+
+
+def LoadMatchboxSnapshot(fileName):
+	"""
+	Replaces the current matchboxes with the ones in the file. The file
+	is mapped and copied into the store in one go
+
+	returns the SnapshotHeader
+	"""
+	with open(fileName, 'rb') as file:
+		with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			header = UnpackHeader(data)
+			store = GetMatchboxes()
+			store.Clear()
+			store.buffer[:] = data[header.size:header.size + MatchboxStore.bufferSize]
+			store.ForgetCumulative(range(matchbox.numRows))
+			store.gameCount = header.gameCount
+	return header
+
+
+def MapMatchboxSnapshot(fileName):
+	"""
+	Maps the file and builds a read only matchbox store right on top of it,
+	with nothing copied. Good for looking up moves from a trained player.
+	Boards the player never saw get the default matchbox
+
+	returns a tuple of (store, header)
+	"""
+	with open(fileName, 'rb') as file:
+		data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+	header = UnpackHeader(data)
+	store = MatchboxStore(memoryview(data)[header.size:header.size + MatchboxStore.bufferSize], readOnly=True)
+	store.gameCount = header.gameCount
+	return (store, header)
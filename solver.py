@@ -0,0 +1,243 @@
+"""
+solver.py
+
+Solves Tic-Tac-Toe with negamax and alpha-beta pruning, sharing one
+transposition table across all the boards that are the same up to
+symmetry. The answers are kept in a tablebase, which can be saved to
+a file, so perfect play is a lookup
+
+Values are from the point of view of the team to move:
+	1 for a win, 0 for a cat's game, -1 for a loss
+"""
+
+import struct
+from random import choice
+
+from statetable import numIndices
+from statetable import IsWinnerIndex
+from statetable import IsCatsGameIndex
+from statetable import LegalMoves
+from statetable import squaresOfMasks
+from symmetry import CanonicalIndex
+from symmetry import CanonicalSymmetry
+from symmetry import squarePermutations
+from position import ChildIndex
+
+
+# Kinds of transposition table entries
+exactValue = 0
+lowerBound = 1
+upperBound = 2
+
+tablebaseMagic = b'TTTB'
+tablebaseVersion = 1
+tablebaseHeaderFormat = '<4sHxxI'
+# index, value and mask of best squares
+tablebaseEntryFormat = '<HbH'
+
+
+def IsOverIndex(index):
+	return IsWinnerIndex(index, 'X') or IsWinnerIndex(index, 'O') or IsCatsGameIndex(index)
+
+
+class Solver:
+	"""
+	table maps a canonical index to a tuple of (value, kind of entry)
+	"""
+	def __init__(self):
+		self.table = {}
+		return
+
+	def Negamax(self, index, alpha=-1, beta=1):
+		"""
+		The value of the board for the team to move, searched with
+		alpha-beta. The answer is exact if it lies strictly between
+		alpha and beta, otherwise it is a bound
+		"""
+		if IsWinnerIndex(index, 'X') or IsWinnerIndex(index, 'O'):
+			# Whoever just moved has won
+			return -1
+		if IsCatsGameIndex(index):
+			return 0
+
+		key = CanonicalIndex(index)
+		if key in self.table:
+			value, kind = self.table[key]
+			if kind == exactValue:
+				return value
+			if kind == lowerBound:
+				alpha = max(alpha, value)
+			else:
+				beta = min(beta, value)
+			if alpha >= beta:
+				return value
+
+		alphaOriginal = alpha
+		best = -2
+		for square in LegalMoves(index):
+			value = -self.Negamax(ChildIndex(index, square), -beta, -alpha)
+			if value > best:
+				best = value
+			if best > alpha:
+				alpha = best
+			if alpha >= beta:
+				break
+
+		if best <= alphaOriginal:
+			kind = upperBound
+		elif best >= beta:
+			kind = lowerBound
+		else:
+			kind = exactValue
+		self.table[key] = (best, kind)
+		return best
+
+	def Value(self, index):
+		"""
+		The exact value of the board
+		"""
+		return self.Negamax(index, -2, 2)
+
+	def BestMoves(self, index):
+		"""
+		The mask of the squares that keep the board's value
+		"""
+		if IsOverIndex(index):
+			return 0
+		value = self.Value(index)
+		bestMoves = 0
+		for square in LegalMoves(index):
+			if -self.Value(ChildIndex(index, square)) == value:
+				bestMoves |= 1 << square
+		return bestMoves
+
+
+class Tablebase:
+	"""
+	The solved value and best moves of every canonical board that can
+	come up in a game. Boards that are not canonical are looked up
+	through their canonical board
+
+	entries maps a canonical index to a tuple of (value, mask of best
+		squares on the canonical board)
+	"""
+	def __init__(self, entries=None):
+		self.entries = entries if entries is not None else {}
+		return
+
+	def Value(self, index):
+		value, _ = self.entries[CanonicalIndex(index)]
+		return value
+
+	def BestMoves(self, index):
+		"""
+		The mask of best squares on this board, which need not be canonical
+		"""
+		_, canonicalMoves = self.entries[CanonicalIndex(index)]
+		permutation = squarePermutations[CanonicalSymmetry(index)]
+		bestMoves = 0
+		for square in squaresOfMasks[canonicalMoves]:
+			bestMoves |= 1 << permutation[square]
+		return bestMoves
+
+	def PerfectMove(self, index):
+		"""
+		Picks one of the best squares at random
+		"""
+		bestMoves = self.BestMoves(index)
+		return choice(squaresOfMasks[bestMoves])
+
+	def Save(self, fileName):
+		"""
+		Writes the header, then one entry per canonical board, in order
+		of index
+		"""
+		with open(fileName, 'wb') as file:
+			file.write(struct.pack(tablebaseHeaderFormat, tablebaseMagic, tablebaseVersion, len(self.entries)))
+			for index in sorted(self.entries):
+				value, bestMoves = self.entries[index]
+				file.write(struct.pack(tablebaseEntryFormat, index, value, bestMoves))
+		return
+
+
+def SolveTablebase():
+	"""
+	Walks every canonical board reachable from the empty board, and
+	solves each one
+
+	returns the Tablebase
+	"""
+	solver = Solver()
+	tablebase = Tablebase()
+	toVisit = [0]
+	while toVisit:
+		index = toVisit.pop()
+		if index in tablebase.entries:
+			continue
+		tablebase.entries[index] = (solver.Value(index), solver.BestMoves(index))
+		if not IsOverIndex(index):
+			for square in LegalMoves(index):
+				toVisit.append(CanonicalIndex(ChildIndex(index, square)))
+	return tablebase
+
+
+def LoadTablebase(fileName):
+	"""
+	Reads a tablebase written by Tablebase.Save
+
+	Raises ValueError if the file is not a tablebase
+	"""
+	headerSize = struct.calcsize(tablebaseHeaderFormat)
+	entrySize = struct.calcsize(tablebaseEntryFormat)
+	with open(fileName, 'rb') as file:
+		data = file.read()
+	if len(data) < headerSize:
+		raise ValueError('Not a tablebase')
+	magic, version, count = struct.unpack_from(tablebaseHeaderFormat, data)
+	if magic != tablebaseMagic or version != tablebaseVersion or len(data) != headerSize + count*entrySize:
+		raise ValueError('Not a tablebase')
+	entries = {}
+	for index, value, bestMoves in struct.iter_unpack(tablebaseEntryFormat, data[headerSize:]):
+		if index >= numIndices or index != CanonicalIndex(index) or value not in (-1, 0, 1):
+			raise ValueError('Not a tablebase')
+		entries[index] = (value, bestMoves)
+	return Tablebase(entries)
+
+
+tablebase = None
+
+def GetTablebase():
+	"""
+	The tablebase for this session, solved the first time it is needed
+	"""
+	global tablebase
+	if tablebase is None:
+		tablebase = SolveTablebase()
+	return tablebase
+
+
+def GetPerfectMoveForIndex(index):
+	"""
+	A perfect player, in the same form as GetComputerMoveForIndex
+	"""
+	return GetTablebase().PerfectMove(index)
+
+
+def RateMatchboxes(matchboxes):
+	"""
+	Measures how close the matchboxes are to perfect play
+
+	returns a tuple of (number of matchboxes whose heaviest square is
+		a best move, number of matchboxes on boards still in play)
+	"""
+	tablebase = GetTablebase()
+	numBest = 0
+	numRated = 0
+	for index, matchbox in matchboxes.items():
+		if IsOverIndex(index):
+			continue
+		heaviest = max(range(9), key=lambda square: matchbox[square])
+		numRated += 1
+		if tablebase.BestMoves(index) & (1 << heaviest):
+			numBest += 1
+	return (numBest, numRated)
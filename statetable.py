@@ -0,0 +1,149 @@
+"""
+statetable.py
+
+A table of facts about every Tic-Tac-Toe board, keyed by the board's
+base 3 index (see TicTacToe.IndexBoard). The table is built once, when
+the module is first imported, so every lookup afterwards is O(1)
+"""
+
+from array import array
+from itertools import product
+
+from bitboard import IsWinningMask
+from bitboard import CountMask
+from bitboard import fullMask
+
+
+numIndices = 3**9
+
+# Bits in the flags for each index
+xWinsFlag = 0x01
+oWinsFlag = 0x02
+catsGameFlag = 0x04
+xToMoveFlag = 0x08
+oToMoveFlag = 0x10
+legalFlag = 0x20
+
+winnerFlags = {'X': xWinsFlag, 'O': oWinsFlag}
+toMoveFlags = {'X': xToMoveFlag, 'O': oToMoveFlag}
+
+
+def BuildStateTable():
+	"""
+	Walks every index in order, and works out its flags, the masks of
+	each team and the mask of the empty squares
+
+	returns a tuple of (flags, xMasks, oMasks, emptyMasks)
+	"""
+	flags = bytearray(numIndices)
+	xMasks = array('H', bytes(2*numIndices))
+	oMasks = array('H', bytes(2*numIndices))
+	emptyMasks = array('H', bytes(2*numIndices))
+
+	# product() counts up with the last square changing fastest,
+	# which is the same order as the base 3 index
+	for index, digits in enumerate(product(range(3), repeat=9)):
+		xMask = 0
+		oMask = 0
+		for square, digit in enumerate(digits):
+			if digit == 2:
+				xMask |= 1 << square
+			elif digit == 1:
+				oMask |= 1 << square
+
+		xWins = IsWinningMask(xMask)
+		oWins = IsWinningMask(oMask)
+		numX = CountMask(xMask)
+		numO = CountMask(oMask)
+
+		stateFlags = 0
+		if xWins:
+			stateFlags |= xWinsFlag
+		if oWins:
+			stateFlags |= oWinsFlag
+		if not xWins and not oWins and numX == 5:
+			stateFlags |= catsGameFlag
+		if numX == numO:
+			stateFlags |= xToMoveFlag
+		if numX == numO + 1:
+			stateFlags |= oToMoveFlag
+
+		legal = numX == numO or numX == numO + 1
+		legal = legal and not (xWins and oWins)
+		legal = legal and not (xWins and numX == numO)
+		legal = legal and not (oWins and numX != numO)
+		if legal:
+			stateFlags |= legalFlag
+
+		flags[index] = stateFlags
+		xMasks[index] = xMask
+		oMasks[index] = oMask
+		emptyMasks[index] = fullMask & ~(xMask | oMask)
+
+	return (flags, xMasks, oMasks, emptyMasks)
+
+
+stateFlags, xMasks, oMasks, emptyMasks = BuildStateTable()
+
+
+def IsWinnerIndex(index, team):
+	"""
+	returns True iff team has won on the board with this index
+	"""
+	return stateFlags[index] & winnerFlags.get(team, 0) != 0
+
+
+def IsCatsGameIndex(index):
+	return stateFlags[index] & catsGameFlag != 0
+
+
+def IsToMoveIndex(index, team):
+	"""
+	returns True iff the piece counts say it is team's turn
+	"""
+	return stateFlags[index] & toMoveFlags.get(team, 0) != 0
+
+
+def IsLegalIndex(index):
+	"""
+	returns True iff the board can come up in a real game
+	"""
+	return stateFlags[index] & legalFlag != 0
+
+
+def MasksFromIndex(index):
+	"""
+	returns a tuple of (xMask, oMask)
+	"""
+	return (xMasks[index], oMasks[index])
+
+
+def EmptyMask(index):
+	return emptyMasks[index]
+
+
+# The squares set in each 9 bit mask, in order
+squaresOfMasks = tuple(tuple(square for square in range(9) if mask & (1 << square))
+		for mask in range(fullMask + 1))
+
+# Filled in by LegalMoves the first time each index is asked for
+legalMoves = [None] * numIndices
+
+
+def EmptySquares(index):
+	"""
+	The empty squares of the board, as a tuple
+	"""
+	return squaresOfMasks[emptyMasks[index]]
+
+
+def LegalMoves(index):
+	"""
+	The squares that can be played on the board, as a tuple. There are
+	none once someone has won
+	"""
+	moves = legalMoves[index]
+	if moves is None:
+		moves = () if stateFlags[index] & (xWinsFlag | oWinsFlag) else squaresOfMasks[emptyMasks[index]]
+		legalMoves[index] = moves
+	return moves
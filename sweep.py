@@ -0,0 +1,171 @@
+"""
+sweep.py
+
+Trains the matchboxes on every game there is, instead of on games picked
+at random, so rare boards get as many updates as common ones
+
+Games are walked on canonical boards, as PlayTicTacToe logs them. Moves
+from the same board that lead to the same canonical board are symmetric,
+so only the first of them is followed. Each game that is walked stands
+for all of the games it is symmetric to, and carries that count with it
+
+Learning a game stops at the first matchbox down to its last bead, so
+games from the empty board stop reaching the boards behind it. A sweep
+therefore learns from the games that start at each board in turn, from
+the fullest boards back to the empty one, and every matchbox that can
+learn anything is updated in every pass
+"""
+
+from random import choices
+from time import perf_counter
+
+from statetable import IsToMoveIndex
+from statetable import IsWinnerIndex
+from statetable import IsCatsGameIndex
+from statetable import LegalMoves
+from statetable import EmptySquares
+from symmetry import CanonicalIndex
+from position import ChildIndex
+from matchbox import ParsedGame
+from matchbox import ParsedMove
+from matchbox import LearnFromParsedGames
+from selfplay import SelfPlayResults
+
+
+def CanonicalChildren(index):
+	"""
+	The moves from a canonical board to each distinct canonical board
+
+	returns a list of (square, child index, number of squares that lead to
+		the child) tuples, in the order of the first such square
+	"""
+	children = {}
+	for square in LegalMoves(index):
+		child = CanonicalIndex(ChildIndex(index, square))
+		if child in children:
+			children[child][2] += 1
+		else:
+			children[child] = [square, child, 1]
+	return [tuple(child) for child in children.values()]
+
+
+def GameResult(index, mover):
+	"""
+	returns the winner after mover's move to index, 'C' for a cat's game,
+	or None if the game goes on
+	"""
+	if IsWinnerIndex(index, mover):
+		return mover
+	if IsCatsGameIndex(index):
+		return 'C'
+	return None
+
+
+def IterCanonicalGames(index=0):
+	"""
+	Walks every game from the canonical board with this index, one at a
+	time, taking only one of each set of symmetric moves
+
+	yields a tuple of (ParsedGame, number of games it stands for)
+	"""
+	def Walk(index, moves, count):
+		mover = 'X' if IsToMoveIndex(index, 'X') else 'O'
+		for square, child, numSquares in CanonicalChildren(index):
+			gameMoves = moves + [ParsedMove(index, mover, square)]
+			winner = GameResult(child, mover)
+			if winner is None:
+				yield from Walk(child, gameMoves, count * numSquares)
+			else:
+				game = ParsedGame()
+				game.winner = winner
+				game.moves = gameMoves
+				yield (game, count * numSquares)
+	yield from Walk(index, [], 1)
+
+
+class ReachabilityTable:
+	"""
+	For each canonical board in a game, the moves to its canonical
+	children and the number of games that go through each of them, so
+	that games can be picked in proportion to how many ways they come up.
+	Boards are added as they are first reached
+	"""
+	def __init__(self):
+		self.numGames = {}
+		self.moves = {}
+		return
+
+	def NumGames(self, index):
+		"""
+		The number of games from the board to the end
+		"""
+		if index not in self.numGames:
+			mover = 'X' if IsToMoveIndex(index, 'X') else 'O'
+			moves = []
+			weights = []
+			for square, child, numSquares in CanonicalChildren(index):
+				moves.append((square, child))
+				weights.append(numSquares * (1 if GameResult(child, mover) else self.NumGames(child)))
+			self.moves[index] = (moves, weights)
+			self.numGames[index] = sum(weights)
+		return self.numGames[index]
+
+	def Boards(self):
+		"""
+		Every canonical board that comes up in a game and is not over,
+		fullest first
+		"""
+		self.NumGames(0)
+		return sorted(self.moves, key=lambda index: len(EmptySquares(index)))
+
+	def PickGame(self, index=0):
+		"""
+		Picks a game from the board, each one as likely as any other
+
+		returns the ParsedGame
+		"""
+		self.NumGames(index)
+		game = ParsedGame()
+		while True:
+			mover = 'X' if IsToMoveIndex(index, 'X') else 'O'
+			moves, weights = self.moves[index]
+			square, child = choices(moves, weights=weights)[0]
+			game.moves.append(ParsedMove(index, mover, square))
+			winner = GameResult(child, mover)
+			if winner is not None:
+				game.winner = winner
+				return game
+			index = child
+
+
+reachability = ReachabilityTable()
+
+
+def SweepTrain(numPasses, samplesPerBoard=None, keepGames=False):
+	"""
+	Learns from numPasses sweeps over the boards, from the fullest back to
+	the empty one
+
+	samplesPerBoard is None to learn from every canonical game from each
+		board, or the number of games to pick from each board in
+		proportion to how many ways they come up
+	keepGames is True to hold on to every ParsedGame in the results
+
+	returns the SelfPlayResults
+	"""
+	results = SelfPlayResults()
+	start = perf_counter()
+	boards = reachability.Boards()
+	for _ in range(numPasses):
+		for index in boards:
+			if samplesPerBoard is None:
+				games = (game for game, _ in IterCanonicalGames(index))
+			else:
+				games = (reachability.PickGame(index) for _ in range(samplesPerBoard))
+			for game in games:
+				LearnFromParsedGames((game,))
+				if keepGames:
+					results.games.append(game)
+				results.Tally(game)
+	results.seconds = perf_counter() - start
+	return results
@@ -0,0 +1,133 @@
+"""
+symmetry.py
+
+Lookup tables for the 8 symmetries of a Tic-Tac-Toe board, so that
+boards can be rotated, flipped and canonicalized by index, without
+building any boards
+
+A symmetry is numbered flips*4 + rotations, meaning the board is first
+flipped horizontally (if flips is 1) and then rotated clockwise, the
+same way CanonicalizeBoard walks them
+"""
+
+from array import array
+from itertools import product
+
+
+numIndices = 3**9
+numSymmetries = 8
+
+# newBoard[square] = board[rotatePermutation[square]]
+rotatePermutation = (6, 3, 0, 7, 4, 1, 8, 5, 2)
+flipPermutation = (2, 1, 0, 5, 4, 3, 8, 7, 6)
+
+
+def BuildSquarePermutations():
+	"""
+	Composes the flip and rotate permutations into the 8 symmetries.
+	For each symmetry, the square of the new board maps onto the square
+	of the original board it was taken from
+	"""
+	permutations = []
+	for flips in range(2):
+		for rotations in range(4):
+			permutation = []
+			for square in range(9):
+				source = square
+				for _ in range(rotations):
+					source = rotatePermutation[source]
+				if flips:
+					source = flipPermutation[source]
+				permutation.append(source)
+			permutations.append(tuple(permutation))
+	return tuple(permutations)
+
+
+def InvertPermutation(permutation):
+	inverse = [0] * len(permutation)
+	for square, source in enumerate(permutation):
+		inverse[source] = square
+	return tuple(inverse)
+
+
+squarePermutations = BuildSquarePermutations()
+inversePermutations = tuple(InvertPermutation(permutation) for permutation in squarePermutations)
+
+
+def BuildSymmetricIndices():
+	"""
+	Builds, for each symmetry, the table of index -> transformed index
+
+	The index is split into its first 5 squares and its last 4, and each
+	half is transformed separately, so each table costs one addition per index
+	"""
+	tables = []
+	for inverse in inversePermutations:
+		weights = [3**(8 - inverse[square]) for square in range(9)]
+		highs = [sum(digit*weight for digit, weight in zip(digits, weights[:5]))
+				for digits in product(range(3), repeat=5)]
+		lows = [sum(digit*weight for digit, weight in zip(digits, weights[5:]))
+				for digits in product(range(3), repeat=4)]
+		tables.append(array('H', [high + low for high in highs for low in lows]))
+	return tuple(tables)
+
+
+def BuildCanonicalTable(symmetricIndices):
+	"""
+	For each index, finds the symmetry that yields the highest index.
+	Ties go to the first symmetry found, as in CanonicalizeBoard
+
+	returns a tuple of (canonicalIndices, canonicalSymmetries)
+	"""
+	canonicalIndices = array('H', bytes(2*numIndices))
+	canonicalSymmetries = bytearray(numIndices)
+	for index in range(numIndices):
+		indexMax = 0
+		symmetryOnMax = 0
+		for symmetry in range(numSymmetries):
+			transformed = symmetricIndices[symmetry][index]
+			if transformed > indexMax:
+				indexMax = transformed
+				symmetryOnMax = symmetry
+		canonicalIndices[index] = indexMax
+		canonicalSymmetries[index] = symmetryOnMax
+	return (canonicalIndices, canonicalSymmetries)
+
+
+symmetricIndices = BuildSymmetricIndices()
+canonicalIndices, canonicalSymmetries = BuildCanonicalTable(symmetricIndices)
+
+
+def TransformIndex(index, symmetry):
+	"""
+	The index of the board after applying the symmetry
+	"""
+	return symmetricIndices[symmetry][index]
+
+
+def TransformSquare(square, symmetry):
+	"""
+	Where the square ends up after applying the symmetry
+	"""
+	return inversePermutations[symmetry][square]
+
+
+def CanonicalIndex(index):
+	return canonicalIndices[index]
+
+
+def CanonicalSymmetry(index):
+	"""
+	The symmetry that takes the board to its canonical board
+	"""
+	return canonicalSymmetries[index]
+
+
+def CanonicalizeIndex(index):
+	"""
+	The integer version of CanonicalizeBoard
+
+	returns a tuple of (index, rotations, flips)
+	"""
+	symmetry = canonicalSymmetries[index]
+	return (canonicalIndices[index], symmetry % 4, symmetry // 4)
@@ -5,7 +5,17 @@ Some tests will assert only if they fail
 Other tests show how the algorithms are working
 """
 
+import asyncio
+import io
+import os
+import sys
+from threading import Thread
+from multiprocessing import Process
+from multiprocessing import Queue
+import tempfile
+from contextlib import redirect_stdout
 from copy import deepcopy
+from itertools import accumulate
 
 from TicTacToe import IsWinner
 from TicTacToe import IsCatsGame
@@ -19,14 +29,102 @@ from TicTacToe import EqualBoards
 from TicTacToe import CanonicalizeBoard
 from TicTacToe import BoardFromIndex
 from TicTacToe import MoveValidation
+from TicTacToe import ValidateMoveForIndex
+
+from bitboard import MasksFromBoard
+from bitboard import IsWinningMask
+from bitboard import CountMask
+from bitboard import lineMasks
+
+from statetable import numIndices
+from statetable import IsWinnerIndex
+from statetable import IsCatsGameIndex
+from statetable import IsLegalIndex
+from statetable import MasksFromIndex
+from statetable import LegalMoves
+from statetable import EmptySquares
+
+from symmetry import squarePermutations
+from symmetry import TransformIndex
+from symmetry import TransformSquare
+from symmetry import CanonicalIndex
+
+from position import Position
 
 from matchbox import DefaultMatchbox
 from matchbox import PickSquareAtRandom
 from matchbox import GetComputerMove
 from matchbox import ParseGames
+from matchbox import IterParseGames
 from matchbox import LearnFromGames
 from matchbox import ClearMatchboxes
 from matchbox import GetMatchboxes
+from matchbox import LinesFromParsedGame
+from matchbox import LearnFromParsedGames
+
+from matchbox import ApplyMatchboxDeltas
+from matchbox import MatchboxStore
+from matchbox import SnapshotMatchboxes
+from matchbox import LoadMatchboxes
+from matchbox import UseMatchboxes
+
+from selfplay import SelfPlay
+from selfplay import PlayGame
+from parallel import ParallelSelfPlay
+
+from snapshot import SaveMatchboxSnapshot
+from snapshot import LoadMatchboxSnapshot
+from snapshot import MapMatchboxSnapshot
+
+from checkpoint import CatchUpFromLog
+
+from benchmark import CompareResults
+
+import instrument
+
+from evaluate import TrainWithEvaluation
+
+from server import GameServer
+from server import LoadTest
+
+from sweep import IterCanonicalGames
+from sweep import SweepTrain
+from sweep import reachability
+
+import gamelog
+from gamelog import ConvertTextLog
+from gamelog import BinaryGameLog
+from gamelog import LearnFromBinaryLog
+from gamelog import PackGame
+
+from corpus import Corpus
+from corpus import CanonicalGame
+from corpus import LoadCorpus
+from corpus import LearnFromCountedGame
+from corpus import LearnFromCorpus
+
+from sharedstore import CreateSharedMatchboxes
+from sharedstore import AttachSharedMatchboxes
+from sharedstore import UseSharedMatchboxes
+
+from lockedstore import UseLockedMatchboxes
+from lockedstore import ThreadedSelfPlay
+
+import batchlearn
+import batchplay
+from batchplay import BatchSelfPlay
+from batchlearn import LearnFromGameLines
+
+from mnk import MnkBoard
+from mnk import MnkPosition
+from mnk import MnkMatchboxes
+
+from solver import Solver
+from solver import SolveTablebase
+from solver import LoadTablebase
+from solver import GetPerfectMoveForIndex
+from solver import RateMatchboxes
+from solver import IsOverIndex
 
 from game import StringFromBoard
 from game import StringFromMatchbox
@@ -486,6 +584,116 @@ def TestCanonicalize(verbose):
 	return allTestsPassed
 
 
+def TestSymmetryTables(verbose):
+	"""
+	Checks the symmetry tables against RotateBoard and FlipBoard
+	"""
+	tests = (
+			(
+				(' ', ' ', ' '),
+				(' ', ' ', 'O'),
+				(' ', ' ', 'X')
+			),
+			(
+				(' ', 'O', 'X'),
+				(' ', 'X', ' '),
+				(' ', ' ', ' ')
+			),
+			(
+				('X', ' ', 'O'),
+				('O', 'X', 'X'),
+				(' ', ' ', 'O')
+			),
+		)
+
+	def TestAssert(board, verbose):
+		passed = True
+		index = IndexBoard(board)
+		transformed = board
+		for flips in range(2):
+			for rotations in range(4):
+				symmetry = flips*4 + rotations
+				permuted = [[board[square//3][square%3] for square in squarePermutations[symmetry][row*3:row*3+3]]
+						for row in range(3)]
+				passed = passed and EqualBoards(permuted, transformed)
+				passed = passed and TransformIndex(index, symmetry) == IndexBoard(transformed)
+				for square in range(9):
+					newSquare = TransformSquare(square, symmetry)
+					passed = passed and transformed[newSquare//3][newSquare%3] == board[square//3][square%3]
+				transformed = RotateBoard(transformed)
+			transformed = FlipBoard(transformed)
+
+		if verbose or not passed:
+			print()
+			print('TestSymmetryTables')
+			print(StringFromBoard(board))
+
+		if not passed:
+			print ('FAILED')
+			return False
+		else:
+			return True
+
+	allTestsPassed = True
+	for test in tests:
+		allTestsPassed = TestAssert(test, verbose) and allTestsPassed
+
+	return allTestsPassed
+
+
+def TestPosition(verbose):
+	"""
+	Plays out logged games on a Position and on a board side by side, and
+	checks that the index, the winner and the canonical form agree
+	"""
+	tests = (
+			((3, 'X'), (5, 'O'), (4, 'X'), (0, 'O'), (7, 'X')),
+			((3, 'X'), (8, 'O'), (3, 'X'), (4, 'O'), (8, 'X'), (2, 'O'), (6, 'X'), (5, 'O')),
+			((5, 'X'), (4, 'O'), (2, 'X'), (2, 'O'), (6, 'X'), (3, 'O'), (5, 'X'), (8, 'O'), (7, 'X')),
+		)
+
+	def TestAssert(moves, verbose):
+		board = [
+				[' ', ' ', ' '],
+				[' ', ' ', ' '],
+				[' ', ' ', ' ']
+			]
+		position = Position()
+		passed = True
+		for move, team in moves:
+			Move(board, team, move)
+			position.Move(team, move)
+			passed = passed and position.index == IndexBoard(board)
+			passed = passed and position.numX == Count(board, 'X') and position.numO == Count(board, 'O')
+			passed = passed and (position.winner == team) == IsWinner(board, team)
+			passed = passed and position.IsCatsGame() == IsCatsGame(board)
+
+			canonicalBoard, index, rotations, flips = CanonicalizeBoard(board)
+			passed = passed and position.Canonicalize() == (rotations, flips) and position.index == index
+			lastRow = position.lastMove // 3
+			lastCol = position.lastMove % 3
+			passed = passed and canonicalBoard[lastRow][lastCol] == team
+			board = canonicalBoard
+
+		if verbose or not passed:
+			print()
+			print('TestPosition')
+			print(StringFromBoard(board))
+			print('  {}'.format(position))
+
+		if not passed:
+			print ('FAILED')
+			return False
+		else:
+			return True
+
+	allTestsPassed = True
+	for test in tests:
+		allTestsPassed = TestAssert(test, verbose) and allTestsPassed
+
+	return allTestsPassed
+
+
 def TestBoardFromIndex(verbose):
 	tests = (
 			(
@@ -531,6 +739,89 @@ def TestBoardFromIndex(verbose):
 	return allTestsPassed
 
 
+def TestMasksFromBoard(verbose):
+	tests = (
+			(
+				('X', ' ', 'O'),
+				('O', 'X', 'X'),
+				(' ', ' ', 'O')
+			),
+			(
+				('X', 'O', 'O'),
+				('X', 'O', 'X'),
+				('X', 'X', 'O'),
+			),
+		)
+	expecteds = (
+			(0b000110001, 0b100001100, False, False),
+			(0b011101001, 0b100010110, True, False),
+		)
+
+	def TestAssert(board, expected, verbose):
+		xMask, oMask = MasksFromBoard(board)
+		passed = (xMask, oMask, IsWinningMask(xMask), IsWinningMask(oMask)) == expected
+		passed = passed and CountMask(xMask) == Count(board, 'X')
+		if verbose or not passed:
+			print()
+			print('TestMasksFromBoard')
+			print(StringFromBoard(board))
+			print ('  result was {:09b} {:09b}, expected {:09b} {:09b}'.format(
+					xMask, oMask, expected[0], expected[1]))
+
+		if not passed:
+			print ('FAILED')
+			return False
+		else:
+			return True
+
+	allTestsPassed = True
+	for test, expected in zip(tests, expecteds):
+		allTestsPassed = TestAssert(test, expected, verbose) and allTestsPassed
+
+	return allTestsPassed
+
+
+def TestStateTable(verbose):
+	"""
+	Checks every entry in the state table against the board functions,
+	and that the number of boards that can come up in a game is right
+	"""
+	def TestAssert(index, verbose):
+		board = BoardFromIndex(index)
+		xMask, oMask = MasksFromBoard(board)
+		passed = MasksFromIndex(index) == (xMask, oMask)
+		passed = passed and IsWinnerIndex(index, 'X') == IsWinningMask(xMask)
+		passed = passed and IsWinnerIndex(index, 'O') == IsWinningMask(oMask)
+		passed = passed and IsCatsGameIndex(index) == (
+				not IsWinningMask(xMask) and not IsWinningMask(oMask) and CountMask(xMask) == 5)
+		if verbose or not passed:
+			print()
+			print('TestStateTable')
+			print(StringFromBoard(board))
+			print('  index {}'.format(index))
+
+		if not passed:
+			print ('FAILED')
+			return False
+		else:
+			return True
+
+	allTestsPassed = True
+	for index in range(numIndices):
+		allTestsPassed = TestAssert(index, verbose) and allTestsPassed
+
+	numLegal = sum(1 for index in range(numIndices) if IsLegalIndex(index))
+	if verbose or numLegal != 5478:
+		print()
+		print('TestStateTable')
+		print('  {} legal boards, expected 5478'.format(numLegal))
+	if numLegal != 5478:
+		print ('FAILED')
+		allTestsPassed = False
+
+	return allTestsPassed
+
+
 def TestDefaultMatchbox(verbose):
 	tests = (
 			(
@@ -581,6 +872,42 @@ def TestDefaultMatchbox(verbose):
 	return allTestsPassed
 
 
+def TestMatchboxStore(verbose):
+	"""
+	Checks that the store behaves like the dict of lists it replaced
+	"""
+	store = MatchboxStore()
+	index = 4374
+	illegalIndex = IndexBoard((('X', 'X', ' '), (' ', ' ', ' '), (' ', ' ', ' ')))
+
+	passed = index not in store and len(store) == 0
+	store[index] = DefaultMatchbox(index)
+	matchbox = store[index]
+	matchbox[8] += 1
+	passed = passed and index in store and len(store) == 1
+	passed = passed and list(store[index]) == [5, 0, 5, 5, 5, 5, 5, 5, 6]
+	passed = passed and list(store.Row(0)) == DefaultMatchbox(0)
+	passed = passed and list(store.keys()) == [0, index]
+	try:
+		store.Row(illegalIndex)
+		passed = False
+	except KeyError:
+		pass
+	store.Clear()
+	passed = passed and index not in store and len(store) == 0
+
+	if verbose or not passed:
+		print()
+		print('TestMatchboxStore')
+		print(store)
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+
 def TestPickSquareAtRandom(verbose):
 	tests = (
 			[5, 5, 5, 5, 5, 0, 5, 5, 0],
@@ -610,6 +937,38 @@ def TestPickSquareAtRandom(verbose):
 	return allTestsPassed
 
 
+def TestPickSquare(verbose):
+	"""
+	Checks that the cached running sums follow the beads as they change,
+	and that the picks only land on squares with beads
+	"""
+	store = MatchboxStore()
+	index = 18313
+
+	passed = store.Cumulative(index) == [0, 0, 0, 5, 5, 10, 15, 15, 15]
+	store.AddBeads(index, 5, -5)
+	store.AddBeads(index, 6, 2)
+	passed = passed and store.Cumulative(index) == list(accumulate(store[index]))
+	passed = passed and store.Total(index) == 12
+	squares = [store.PickSquare(index) for _ in range(200)]
+	passed = passed and set(squares) <= {3, 6} and len(squares) == 200
+
+	store[index] = [0, 0, 0, 0, 0, 1, 0, 0, 0]
+	passed = passed and store.Total(index) == 1 and store.PickSquare(index) == 5
+
+	if verbose or not passed:
+		print()
+		print('TestPickSquare')
+		print(list(store[index]))
+		print(store.Cumulative(index))
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+
 def TestGetComputerMove(verbose):
 	tests = (
 			(
@@ -706,6 +1065,51 @@ def TestParseGames(verbose):
 	return allTestsPassed
 
 
+def TestIterParseGames(verbose):
+	"""
+	Checks that games come out one at a time, before the rest of the
+	lines are read, and that file lines with their newlines parse
+	"""
+	lines = [
+		"I 0\n",
+		"M X 4\n",
+		"I 162\n",
+		"M O 0\n",
+		"\n",
+		"W O\n",
+		"I 0\n",
+		"M X 3\n",
+		"C\n",
+	]
+	linesRead = []
+
+	def ReadLines():
+		for line in lines:
+			linesRead.append(line)
+			yield line
+
+	games = IterParseGames(ReadLines())
+	firstGame = next(games)
+	passed = len(linesRead) == 6
+	passed = passed and firstGame.winner == 'O' and len(firstGame.moves) == 2
+	passed = passed and str(firstGame.moves[1]) == 'Index: 162, Team: O, Square: 0'
+	secondGame = next(games)
+	passed = passed and secondGame.winner == 'C' and len(secondGame.moves) == 1
+	passed = passed and next(games, None) is None
+
+	if verbose or not passed:
+		print()
+		print('TestIterParseGames')
+		print(f'Lines read: {len(linesRead)}')
+		print(firstGame)
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+
 def TestLearnFromGames(verbose):
 	tests = (
 		(
@@ -817,6 +1221,915 @@ def TestLearnFromGames(verbose):
 
 	return allTestsPassed
 
+def TestSelfPlay(verbose):
+	"""
+	Runs some headless games, and checks that every move was valid, that
+	the tally adds up and that the games survive a trip through the log format
+	"""
+	def TestAssert(game, verbose):
+		passed = True
+		for move in game.moves:
+			passed = passed and ValidateMoveForIndex(move.index, move.mover, move.square) == MoveValidation.Valid
+
+		reparsed = ParseGames(LinesFromParsedGame(game))
+		passed = passed and len(reparsed) == 1 and reparsed[0].winner == game.winner
+		passed = passed and [str(move) for move in reparsed[0].moves] == [str(move) for move in game.moves]
+
+		if verbose or not passed:
+			print()
+			print('TestSelfPlay')
+			print(game)
+
+		if not passed:
+			print ('FAILED')
+			return False
+		else:
+			return True
+
+	ClearMatchboxes()
+	results = SelfPlay(50, learn=True, keepGames=True)
+	allTestsPassed = results.numGames == 50 and len(results.games) == 50
+	allTestsPassed = allTestsPassed and results.xWins + results.oWins + results.catsGames == 50
+	if verbose or not allTestsPassed:
+		print()
+		print('TestSelfPlay')
+		print(results)
+	for game in results.games:
+		allTestsPassed = TestAssert(game, verbose) and allTestsPassed
+
+	return allTestsPassed
+
+def TestParallelSelfPlay(verbose):
+	"""
+	Trains across two processes, and checks the tally and that the merged
+	deltas reached the matchboxes. Also checks that applying deltas never
+	takes more beads from a square than it has, and never empties a
+	matchbox
+	"""
+	ClearMatchboxes()
+	results = ParallelSelfPlay(200, numWorkers=2, syncInterval=50)
+	passed = results.numGames == 200
+	passed = passed and results.xWins + results.oWins + results.catsGames == 200
+	passed = passed and any(list(matchbox) != DefaultMatchbox(index) for index, matchbox in GetMatchboxes().items())
+
+	ClearMatchboxes()
+	index = 18331
+	ApplyMatchboxDeltas({index: [0, 0, 0, -3, 0, 0, 0, 0, 0]})
+	ApplyMatchboxDeltas({index: [0, 0, 0, 0, 0, -9, 0, 0, 0]})
+	passed = passed and list(GetMatchboxes()[index]) == [0, 0, 0, 2, 0, 0, 0, 0, 0]
+	ApplyMatchboxDeltas({index: [0, 0, 0, -2, 0, 0, 0, 0, 0]})
+	passed = passed and list(GetMatchboxes()[index]) == [0, 0, 0, 2, 0, 0, 0, 0, 0]
+	ApplyMatchboxDeltas({0: [-8, 0, 0, 0, 0, 0, 0, 0, 0]})
+	passed = passed and list(GetMatchboxes()[0]) == [0, 5, 5, 5, 5, 5, 5, 5, 5]
+
+	if verbose or not passed:
+		print()
+		print('TestParallelSelfPlay')
+		print(results)
+		print(list(GetMatchboxes()[index]))
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestMatchboxSnapshot(verbose):
+	"""
+	Saves trained matchboxes, and checks that both loading and mapping
+	the file give back the same matchboxes and game count, and that the
+	mapped store can pick moves on boards that are not in the file
+	"""
+	ClearMatchboxes()
+	SelfPlay(100, learn=True)
+	expected = SnapshotMatchboxes()
+	expectedCount = GetMatchboxes().gameCount
+
+	with tempfile.TemporaryDirectory() as directory:
+		fileName = os.path.join(directory, 'matchboxes.bin')
+		SaveMatchboxSnapshot(fileName)
+		ClearMatchboxes()
+		header = LoadMatchboxSnapshot(fileName)
+		passed = SnapshotMatchboxes() == expected and GetMatchboxes().gameCount == expectedCount
+		passed = passed and header.gameCount == expectedCount == 100
+
+		store, header = MapMatchboxSnapshot(fileName)
+		passed = passed and {index: list(matchbox) for index, matchbox in store.items()} == expected
+		passed = passed and store.PickSquare(0) in range(9)
+		# A board the player never saw is read as the default, not written
+		unseen = next(index for index in range(numIndices) if IsLegalIndex(index) and index not in store)
+		passed = passed and store.PickSquare(unseen) in EmptySquares(unseen)
+		passed = passed and store.Total(unseen) == sum(DefaultMatchbox(unseen)) and unseen not in store
+		store = None
+
+	if verbose or not passed:
+		print()
+		print('TestMatchboxSnapshot')
+		print(header)
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestCatchUpFromLog(verbose):
+	"""
+	Writes half of games.txt, catches up, appends the rest along with a
+	partly written game, and catches up again. The matchboxes should come
+	out the same as learning from the whole log in one go. A log that is
+	rewritten, or a checkpoint that was cut short, should be learned
+	from the start, and a checkpoint that can't be written should not
+	stop the log from loading
+	"""
+	with open('games.txt', 'r') as file:
+		lines = file.read().splitlines()
+	half = lines.index('W X', len(lines) // 2) + 1
+
+	ClearMatchboxes()
+	LearnFromGames(lines)
+	expected = SnapshotMatchboxes()
+	expectedCount = GetMatchboxes().gameCount
+
+	with tempfile.TemporaryDirectory() as directory:
+		fileName = os.path.join(directory, 'games.txt')
+		with open(fileName, 'w') as file:
+			file.write('\n'.join(lines[:half]) + '\n')
+		firstCount = CatchUpFromLog(fileName)
+		ClearMatchboxes()
+		with open(fileName, 'a') as file:
+			file.write('\n'.join(lines[half:]) + '\nI 0\nM X 4\n')
+		secondCount = CatchUpFromLog(fileName)
+		thirdCount = CatchUpFromLog(fileName)
+		passed = firstCount + secondCount == expectedCount and thirdCount == 0
+		passed = passed and SnapshotMatchboxes() == expected and GetMatchboxes().gameCount == expectedCount
+		passed = passed and sorted(os.listdir(directory)) == ['games.txt', 'games.txt.ckpt']
+
+		# The same games in another order, so the log is just as long
+		rewritten = lines[half:] + lines[:half]
+		with open(fileName, 'w') as file:
+			file.write('\n'.join(rewritten) + '\n')
+		ClearMatchboxes()
+		LearnFromGames(rewritten)
+		rewrittenExpected = SnapshotMatchboxes()
+		ClearMatchboxes()
+		passed = passed and CatchUpFromLog(fileName) == expectedCount
+		passed = passed and SnapshotMatchboxes() == rewrittenExpected
+
+		checkpointName = fileName + '.ckpt'
+		with open(checkpointName, 'rb') as file:
+			checkpoint = file.read()
+		with open(checkpointName, 'wb') as file:
+			file.write(checkpoint[:len(checkpoint) // 2])
+		passed = passed and CatchUpFromLog(fileName) == expectedCount
+		passed = passed and SnapshotMatchboxes() == rewrittenExpected
+
+		# A checkpoint that can't be written still leaves the log learned
+		os.remove(checkpointName)
+		os.mkdir(checkpointName)
+		with redirect_stdout(io.StringIO()) as output:
+			unsavedCount = CatchUpFromLog(fileName)
+		passed = passed and unsavedCount == expectedCount and SnapshotMatchboxes() == rewrittenExpected
+		passed = passed and 'checkpoint' in output.getvalue() and not os.path.exists(checkpointName + '.tmp')
+
+	if verbose or not passed:
+		print()
+		print('TestCatchUpFromLog')
+		print('  learned {} then {} then {} games, expected {} in all'.format(
+				firstCount, secondCount, thirdCount, expectedCount))
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestSolver(verbose):
+	"""
+	Checks some known values, that the tablebase survives a trip through
+	a file, that perfect play against itself is always a cat's game, and
+	that matchboxes are rated against the tablebase
+	"""
+	tests = (
+			(
+				(' ', ' ', ' '),
+				(' ', ' ', ' '),
+				(' ', ' ', ' ')
+			),
+			(
+				('X', 'X', ' '),
+				('O', 'O', ' '),
+				(' ', ' ', ' ')
+			),
+			(
+				('X', ' ', ' '),
+				(' ', 'O', ' '),
+				(' ', ' ', 'X')
+			),
+			(
+				(' ', 'O', ' '),
+				(' ', 'X', ' '),
+				(' ', ' ', ' ')
+			),
+		)
+	expecteds = (
+			(0, 0b111111111),
+			(1, 0b000000100),
+			(0, 0b010101010),
+			(1, 0b101101101),
+		)
+
+	solver = Solver()
+	tablebase = SolveTablebase()
+	passed = True
+	for board, expected in zip(tests, expecteds):
+		index = IndexBoard(board)
+		result = (tablebase.Value(index), tablebase.BestMoves(index))
+		passed = passed and result == expected and solver.Value(index) == expected[0]
+		if verbose or result != expected:
+			print()
+			print('TestSolver')
+			print(StringFromBoard(board))
+			print('  result was {}, expected {}'.format(result, expected))
+
+	with tempfile.TemporaryDirectory() as directory:
+		fileName = os.path.join(directory, 'tablebase.bin')
+		tablebase.Save(fileName)
+		loaded = LoadTablebase(fileName)
+		fileSize = os.path.getsize(fileName)
+	passed = passed and loaded.entries == tablebase.entries and fileSize == 12 + 5 * len(tablebase.entries)
+
+	# Heaviest on a best move in every matchbox, then on a worse move where there is one
+	inPlay = [index for index in tablebase.entries if not IsOverIndex(index)]
+	perfect = {}
+	worse = {}
+	numWorse = 0
+	for index in inPlay:
+		bestMoves = tablebase.BestMoves(index)
+		legal = LegalMoves(index)
+		bestSquare = next(square for square in legal if bestMoves & (1 << square))
+		worseSquares = [square for square in legal if not bestMoves & (1 << square)]
+		perfect[index] = [9 if square == bestSquare else 1 for square in range(9)]
+		heaviest = worseSquares[0] if worseSquares else bestSquare
+		worse[index] = [9 if square == heaviest else 1 for square in range(9)]
+		numWorse += 1 if worseSquares else 0
+	ratings = (RateMatchboxes(perfect), RateMatchboxes(worse))
+	expectedRatings = ((len(inPlay), len(inPlay)), (len(inPlay) - numWorse, len(inPlay)))
+	passed = passed and ratings == expectedRatings and 0 < numWorse < len(inPlay)
+	if verbose or ratings != expectedRatings:
+		print()
+		print('TestSolver')
+		print('  ratings were {}, expected {}'.format(ratings, expectedRatings))
+
+	players = {'X': GetPerfectMoveForIndex, 'O': GetPerfectMoveForIndex}
+	winners = [PlayGame(players).winner for _ in range(20)]
+	passed = passed and winners == ['C'] * 20
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestCompareBenchmarks(verbose):
+	"""
+	Checks that only benchmarks slower than the tolerance are flagged
+	"""
+	baseline = {'benchmarks': {
+			'IsWinner': {'opsPerSecond': 1000.0},
+			'SelfPlay': {'opsPerSecond': 1000.0},
+			'Retired': {'opsPerSecond': 1000.0},
+		}}
+	results = {'benchmarks': {
+			'IsWinner': {'opsPerSecond': 850.0},
+			'SelfPlay': {'opsPerSecond': 700.0},
+			'New': {'opsPerSecond': 10.0},
+		}}
+	comparisons = CompareResults(results, baseline, 0.2)
+	passed = comparisons == [('IsWinner', 0.85, False), ('SelfPlay', 0.7, True)]
+
+	if verbose or not passed:
+		print()
+		print('TestCompareBenchmarks')
+		print(comparisons)
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestInstrument(verbose):
+	"""
+	Checks that Timed leaves functions alone when instrumentation is off,
+	and counts and times them when it is on
+	"""
+	def Square(number):
+		return number * number
+
+	wasEnabled = instrument.enabled
+	instrument.enabled = False
+	passed = instrument.Timed(Square) is Square
+
+	instrument.enabled = True
+	instrument.Reset()
+	timedSquare = instrument.Timed(Square)
+	passed = passed and [timedSquare(number) for number in range(5)] == [0, 1, 4, 9, 16]
+	name = Square.__qualname__
+	passed = passed and instrument.counters[name] == 5 and instrument.timers[name] > 0
+	passed = passed and name in instrument.Report()
+	instrument.enabled = wasEnabled
+	instrument.Reset()
+
+	if verbose or not passed:
+		print()
+		print('TestInstrument')
+		print(instrument.Report())
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestTrainWithEvaluation(verbose):
+	"""
+	Checks that every evaluation is made and written out, and that no
+	amount of training beats the perfect player
+	"""
+	ClearMatchboxes()
+	with tempfile.TemporaryDirectory() as directory:
+		fileName = os.path.join(directory, 'curve.csv')
+		evaluations = TrainWithEvaluation(200, 100, 20, fileName, numWorkers=2)
+		with open(fileName, 'r') as file:
+			lines = file.read().splitlines()
+
+	passed = [(evaluation.trainingGames, evaluation.opponent) for evaluation in evaluations] == [
+			(0, 'Random'), (0, 'Perfect'), (100, 'Random'), (100, 'Perfect'), (200, 'Random'), (200, 'Perfect')]
+	passed = passed and all(evaluation.NumGames() == 20 for evaluation in evaluations)
+	passed = passed and all(evaluation.wins == 0 for evaluation in evaluations if evaluation.opponent == 'Perfect')
+	passed = passed and len(lines) == 7 and lines[0].startswith('trainingGames,opponent')
+
+	if verbose or not passed:
+		print()
+		print('TestTrainWithEvaluation')
+		for evaluation in evaluations:
+			print(evaluation)
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestGameServer(verbose):
+	"""
+	Runs a small load test against a server on a free port, and checks
+	that every game finished and was learned from
+	"""
+	async def RunLoadTest():
+		server = GameServer(learnBatchSize=10)
+		await server.Start('127.0.0.1', 0)
+		port = server.server.sockets[0].getsockname()[1]
+		results = await LoadTest(20, 3, '127.0.0.1', port)
+		await server.Stop()
+		return (server, results)
+
+	ClearMatchboxes()
+	server, results = asyncio.run(RunLoadTest())
+	passed = results.numGames == 60 and server.numGamesLearned == 60 and server.numSessions == 20
+	passed = passed and GetMatchboxes().gameCount == 60
+	passed = passed and 0 < results.p50 <= results.p99
+
+	if verbose or not passed:
+		print()
+		print('TestGameServer')
+		print(results)
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+
+def TestLearnFromGameLines(verbose):
+	"""
+	Learns from games.txt and from a run of self play, in blocks, with and
+	without numpy. The matchboxes should come out just as LearnFromGames
+	leaves them, and both parsers should agree on lines with extra spaces
+	"""
+	with open('games.txt', 'r') as file:
+		lines = file.read().splitlines()
+	ClearMatchboxes()
+	lines = lines + [line for game in SelfPlay(3000, learn=True, keepGames=True).games
+			for line in LinesFromParsedGame(game)]
+
+	ClearMatchboxes()
+	LearnFromGames(lines)
+	expected = SnapshotMatchboxes()
+	expectedCount = GetMatchboxes().gameCount
+
+	passed = True
+	numpy = batchlearn.numpy
+	blockLines = batchlearn.blockLines
+	for useNumpy in (True, False):
+		if useNumpy and numpy is None:
+			continue
+		batchlearn.numpy = numpy if useNumpy else None
+		batchlearn.blockLines = 1000
+		ClearMatchboxes()
+		numGames = LearnFromGameLines(lines)
+		batchlearn.numpy = numpy
+		batchlearn.blockLines = blockLines
+		passed = passed and numGames == expectedCount and GetMatchboxes().gameCount == expectedCount
+		passed = passed and SnapshotMatchboxes() == expected
+
+		if verbose or not passed:
+			print()
+			print('TestLearnFromGameLines, numpy: {}'.format(useNumpy))
+			print('  learned {} games, expected {}'.format(numGames, expectedCount))
+
+	# Both parsers should read the same games from the same bytes, however
+	# the lines are spaced. numpy takes trailing spaces itself, and hands
+	# anything else back to Python
+	def BlockLists(block):
+		return [block.numGames, block.size] + [[int(value) for value in values] for values in
+				(block.indices, block.squares, block.increments, block.moveStarts)]
+	head = lines[:lines.index('W X') + 1]
+	numHeadGames = sum(1 for line in head if line[:1] in ('W', 'C'))
+	variants = {
+			'trailing spaces': [line + ' ' for line in head],
+			'trailing tabs': [line + '\t ' for line in head],
+			'carriage returns': [line + '\r' for line in head],
+			'double spaces': [line.replace(' ', '  ') for line in head],
+			'leading spaces': [' ' + line for line in head],
+		}
+	for name, variant in variants.items():
+		data = ('\n'.join(variant) + '\n').encode('ascii')
+		expectedBlock = BlockLists(batchlearn.ParseGameBlockInPython(data))
+		passed = passed and expectedBlock[0] == numHeadGames and BlockLists(batchlearn.ParseGameBlock(data)) == expectedBlock
+		if numpy is not None and (name.startswith('trailing') or name == 'carriage returns'):
+			passed = passed and BlockLists(batchlearn.ParseGameBlockWithNumpy(data)) == expectedBlock
+		if verbose or not passed:
+			print('  {}: {}'.format(name, expectedBlock))
+	if numpy is not None:
+		try:
+			batchlearn.ParseGameBlockWithNumpy(b'I 0x\nM X 4\nC\n')
+			passed = False
+		except ValueError:
+			pass
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestLegalMoves(verbose):
+	"""
+	Checks the legal moves of every board against a scan of the board
+	"""
+	passed = True
+	for index in range(numIndices):
+		board = BoardFromIndex(index)
+		empty = tuple(square for square in range(9) if board[square // 3][square % 3] == ' ')
+		won = IsWinner(board, 'X') or IsWinner(board, 'O')
+		passed = passed and EmptySquares(index) == empty
+		passed = passed and LegalMoves(index) == (() if won else empty)
+		if IsLegalIndex(index):
+			passed = passed and DefaultMatchbox(index) == [5 if square in empty else 0 for square in range(9)]
+		if not passed:
+			break
+	passed = passed and Position(4374).LegalMoves() == (0, 2, 3, 4, 5, 6, 7, 8)
+
+	if verbose or not passed:
+		print()
+		print('TestLegalMoves')
+		print('  stopped at index {}'.format(index))
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestSweep(verbose):
+	"""
+	Walks every game up to symmetry, which should stand for all 255168
+	games, then checks that one sweep reaches every board that has a game
+	that is not a cat's game
+	"""
+	games = list(IterCanonicalGames())
+	passed = len(games) == 26830 and sum(count for _, count in games) == 255168
+	passed = passed and reachability.NumGames(0) == 255168
+
+	boards = reachability.Boards()
+	learnable = [index for index in boards if any(game.winner != 'C' for game, _ in IterCanonicalGames(index))]
+	ClearMatchboxes()
+	results = SweepTrain(1)
+	passed = passed and len(boards) == 627 and all(index in GetMatchboxes() for index in learnable)
+	passed = passed and len(GetMatchboxes()) == len(learnable)
+
+	ClearMatchboxes()
+	sampled = SweepTrain(2, samplesPerBoard=3)
+	passed = passed and sampled.numGames == 2 * 3 * len(boards)
+
+	if verbose or not passed:
+		print()
+		print('TestSweep')
+		print(results)
+		print('  {} boards, {} that can learn, {} matchboxes'.format(len(boards), len(learnable), len(GetMatchboxes())))
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestBatchSelfPlay(verbose):
+	"""
+	Plays a batch of games in lockstep. Every game should replay move by
+	move on a Position, learning from the batch in one go should match
+	learning from its games one at a time, and no square should ever have
+	fewer than no beads. Needs numpy
+	"""
+	if batchplay.numpy is None:
+		if verbose:
+			print()
+			print('TestBatchSelfPlay skipped, numpy is not installed')
+		return True
+
+	ClearMatchboxes()
+	BatchSelfPlay(5000, batchSize=1000, seed=1)
+	before = SnapshotMatchboxes()
+	results = BatchSelfPlay(1000, batchSize=1000, keepGames=True, seed=2)
+	after = SnapshotMatchboxes()
+
+	passed = results.numGames == 1000 and len(results.games) == 1000
+	passed = passed and results.xWins + results.oWins + results.catsGames == 1000
+	for game in results.games:
+		position = Position()
+		for move in game.moves:
+			passed = passed and position.index == move.index
+			passed = passed and position.ValidateMove(move.mover, move.square) == MoveValidation.Valid
+			position.Move(move.mover, move.square)
+			position.Canonicalize()
+		passed = passed and (position.winner or 'C') == game.winner
+
+	LoadMatchboxes(before)
+	LearnFromParsedGames(results.games)
+	passed = passed and SnapshotMatchboxes() == after
+
+	# Many games in a batch lose with the same squares, which must still
+	# never be left with fewer than no beads
+	ClearMatchboxes()
+	BatchSelfPlay(20000, seed=3)
+	passed = passed and all(min(matchbox) >= 0 for matchbox in GetMatchboxes().values())
+
+	if verbose or not passed:
+		print()
+		print('TestBatchSelfPlay')
+		print(results)
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestBinaryGameLog(verbose):
+	"""
+	Converts games.txt to a binary log, and checks that it is far smaller,
+	that its games read back the same, and that learning from it matches
+	learning from the text, with and without numpy
+	"""
+	with open('games.txt', 'r') as file:
+		lines = file.read().splitlines()
+	parsedGames = ParseGames(lines)
+	ClearMatchboxes()
+	LearnFromGames(lines)
+	expected = SnapshotMatchboxes()
+
+	passed = True
+	with tempfile.TemporaryDirectory() as directory:
+		fileName = os.path.join(directory, 'games.tttg')
+		numGames = ConvertTextLog('games.txt', fileName)
+		passed = passed and numGames == len(parsedGames)
+		passed = passed and os.path.getsize(fileName) * 10 < os.path.getsize('games.txt')
+
+		with BinaryGameLog(fileName) as log:
+			passed = passed and len(log) == numGames
+			passed = passed and [LinesFromParsedGame(game) for game in ParseGames(log)] == [
+					LinesFromParsedGame(game) for game in parsedGames]
+
+		numpy = gamelog.numpy
+		for useNumpy in (True, False):
+			if useNumpy and numpy is None:
+				continue
+			gamelog.numpy = numpy if useNumpy else None
+			ClearMatchboxes()
+			passed = passed and LearnFromBinaryLog(fileName) == numGames
+			gamelog.numpy = numpy
+			passed = passed and SnapshotMatchboxes() == expected and GetMatchboxes().gameCount == numGames
+
+	# A game that was not canonicalized as it was played cannot be packed
+	try:
+		PackGame(ParseGames(['I 0', 'M X 0', 'I 13122', 'M O 4', 'I 13149', 'M X 8', 'W X'])[0])
+		passed = False
+	except ValueError:
+		pass
+
+	if verbose or not passed:
+		print()
+		print('TestBinaryGameLog')
+		print('  {} games'.format(len(parsedGames)))
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestCorpus(verbose):
+	"""
+	Games that only differ by symmetric squares should be counted together,
+	and learning from a game with a count should match learning from it
+	that many times in a row, last bead and all. Learning from a corpus
+	should match replaying its canonical games, which differs from
+	replaying the log only in which of the symmetric squares get the beads
+	"""
+	lines = ['I 0', 'M X 3', 'R 1', 'I 4374', 'M O 5', 'F 1', 'I 4617', 'M X 4',
+			'I 4779', 'M O 0', 'I 11340', 'M X 7', 'W X']
+	game = ParseGames(lines)[0]
+	mirrored = ParseGames(['M X 5' if line == 'M X 3' else line for line in lines])[0]
+	corpus = Corpus()
+	corpus.AddGames([game, mirrored, game])
+	passed = len(corpus) == 1 and corpus.NumGames() == 3
+
+	ClearMatchboxes()
+	LearnFromCorpus(corpus)
+	learned = SnapshotMatchboxes()
+	ClearMatchboxes()
+	LearnFromParsedGames(CanonicalGame(parsedGame) for parsedGame in (game, mirrored, game))
+	passed = passed and SnapshotMatchboxes() == learned
+	ClearMatchboxes()
+	LearnFromGames(lines + ['M X 5' if line == 'M X 3' else line for line in lines] + lines)
+	replayed = SnapshotMatchboxes()
+	passed = passed and replayed != learned and replayed.keys() == learned.keys()
+	passed = passed and all(sum(replayed[index]) == sum(learned[index]) for index in learned)
+
+	with open('games.txt', 'r') as file:
+		corpus.AddGames(IterParseGames(file))
+	passed = passed and corpus.NumGames() == 237
+
+	for count in (1, 4, 30):
+		ClearMatchboxes()
+		LearnFromParsedGames([game] * count)
+		expected = SnapshotMatchboxes()
+		ClearMatchboxes()
+		LearnFromCountedGame(game, count)
+		passed = passed and SnapshotMatchboxes() == expected and GetMatchboxes().gameCount == count
+
+	with tempfile.TemporaryDirectory() as directory:
+		fileName = os.path.join(directory, 'games.corpus')
+		corpus.Save(fileName)
+		loaded = LoadCorpus(fileName)
+	passed = passed and loaded.counts == corpus.counts
+	ClearMatchboxes()
+	passed = passed and LearnFromCorpus(loaded) == 237 and GetMatchboxes().gameCount == 237
+
+	if verbose or not passed:
+		print()
+		print('TestCorpus')
+		print(corpus)
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def ReadSharedMatchboxes(name, index, requests, replies):
+	"""
+	Runs in a reader process for TestSharedMatchboxes, sending back the
+	total of the index's matchbox and the game count for each request
+	"""
+	store = UseSharedMatchboxes(name)
+	while requests.get():
+		replies.put((GetMatchboxes().Total(index), GetMatchboxes().gameCount))
+	store.Close()
+	return
+
+def TestSharedMatchboxes(verbose):
+	"""
+	Readers of a shared block, in this process and another one, should see
+	what the writer learns as soon as it is learned, and never write.
+	Training and evaluating in a pool should leave the block to the writer
+	"""
+	ClearMatchboxes()
+	with open('games.txt', 'r') as file:
+		LearnFromGames(file)
+	index = 0
+	game = ParseGames(['I 0', 'M X 3', 'R 1', 'I 4374', 'M O 5', 'F 1', 'I 4617', 'M X 4',
+			'I 4779', 'M O 0', 'I 11340', 'M X 7', 'W X'])[0]
+	expected = GetMatchboxes().Total(index)
+	numGames = GetMatchboxes().gameCount
+
+	store = CreateSharedMatchboxes()
+	reader = AttachSharedMatchboxes(store.sharedMemory.name)
+	requests = Queue()
+	replies = Queue()
+	process = Process(target=ReadSharedMatchboxes, args=(store.sharedMemory.name, index, requests, replies))
+	process.start()
+	previous = UseMatchboxes(store)
+	try:
+		passed = reader.Total(index) == expected and reader.gameCount == numGames
+		requests.put(True)
+		passed = passed and replies.get(timeout=30) == (expected, numGames)
+
+		LearnFromParsedGames([game])
+		passed = passed and reader.Total(index) == expected + 1 and reader.gameCount == numGames + 1
+		requests.put(True)
+		passed = passed and replies.get(timeout=30) == (expected + 1, numGames + 1)
+
+		# A board the writer has not seen is read as the default matchbox
+		unseen = next(index for index in range(numIndices) if IsLegalIndex(index) and index not in store)
+		passed = passed and reader.Total(unseen) == sum(DefaultMatchbox(unseen)) and unseen not in store
+		try:
+			reader.AddBeads(index, 4, 1)
+			passed = False
+		except TypeError:
+			pass
+
+		# Forked pool workers must load their snapshots into matchboxes of
+		# their own, not into the shared ones
+		before = SnapshotMatchboxes()
+		TrainWithEvaluation(0, 100, 10, numWorkers=2)
+		passed = passed and SnapshotMatchboxes() == before and store.gameCount == numGames + 1
+		ParallelSelfPlay(400, numWorkers=2, syncInterval=100)
+		passed = passed and store.gameCount == numGames + 401 and reader.gameCount == numGames + 401
+	finally:
+		requests.put(False)
+		process.join()
+		UseMatchboxes(previous)
+		reader.Close()
+		store.Close()
+		store.sharedMemory.unlink()
+	passed = passed and process.exitcode == 0
+
+	if verbose or not passed:
+		print()
+		print('TestSharedMatchboxes')
+		print(expected, numGames)
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestLockedMatchboxes(verbose):
+	"""
+	Threads adding beads to the same matchboxes at once, with threads
+	switching as often as they can, should not lose any of them. Threads
+	playing and learning, alongside a thread loading a log and merging
+	deltas, should count every game, never leave a square with fewer than
+	no beads and never take the last bead. Threads that spend most of
+	their time waiting should play faster than one thread
+	"""
+	with open('games.txt', 'r') as file:
+		lines = file.read().splitlines()
+	ClearMatchboxes()
+	numLogGames = LearnFromGameLines(lines)
+	expected = SnapshotMatchboxes()
+	ClearMatchboxes()
+
+	previous = GetMatchboxes()
+	store = UseLockedMatchboxes()
+	switchInterval = sys.getswitchinterval()
+	sys.setswitchinterval(1e-6)
+	passed = True
+	results = None
+	one = None
+	four = None
+	indices = [0, 4374, 4617, 6615]
+	try:
+		# Batch learning on a locked store goes a move at a time, and
+		# should still match
+		passed = LearnFromGameLines(lines) == numLogGames and SnapshotMatchboxes() == expected
+		store.Clear()
+
+		numThreads = 8
+		numAdds = 500
+		def AddBeads():
+			for add in range(numAdds):
+				index = indices[add % len(indices)]
+				store.AddBeads(index, EmptySquares(index)[0], 1)
+			return
+		threads = [Thread(target=AddBeads) for _ in range(numThreads)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		added = numThreads * numAdds // len(indices)
+		passed = passed and all(store.Total(index) == sum(DefaultMatchbox(index)) + added for index in indices)
+
+		store.Clear()
+		def LoadAndMerge():
+			LearnFromGameLines(lines)
+			for _ in range(50):
+				ApplyMatchboxDeltas({index: [-1] * 9 for index in indices}, 1)
+			return
+		loader = Thread(target=LoadAndMerge)
+		loader.start()
+		results = ThreadedSelfPlay(2000, numThreads)
+		loader.join()
+		passed = passed and results.numGames == 2000 and store.gameCount == 2000 + numLogGames + 50
+		passed = passed and all(min(matchbox) >= 0 and sum(matchbox) >= 1 for matchbox in store.values())
+		sys.setswitchinterval(switchInterval)
+
+		# Waiting threads should scale close to 4 times. Only fail when
+		# they clearly don't, so a busy machine doesn't fail the test
+		one = ThreadedSelfPlay(200, 1, pause=0.002)
+		four = ThreadedSelfPlay(200, 4, pause=0.002)
+		passed = passed and four.GamesPerSecond() > 1.5 * one.GamesPerSecond()
+	finally:
+		sys.setswitchinterval(switchInterval)
+		UseMatchboxes(previous)
+
+	try:
+		ThreadedSelfPlay(1, 1)
+		passed = False
+	except ValueError:
+		pass
+
+	if verbose or not passed:
+		print()
+		print('TestLockedMatchboxes')
+		print([store.Total(index) for index in indices])
+		print(results)
+		print(one)
+		print(four)
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
+def TestMnkBoard(verbose):
+	"""
+	Checks that the 3,3,3 board agrees with the Tic-Tac-Toe tables,
+	then trains matchboxes on 4x4 boards with 4 in a row
+	"""
+	board = MnkBoard(3, 3, 3)
+	passed = set(board.lineMasks) == set(lineMasks)
+	passed = passed and dict(board.squarePermutations) == dict(enumerate(squarePermutations))
+	for index in range(0, numIndices, 7):
+		if IsLegalIndex(index):
+			passed = passed and board.MasksFromIndex(index) == MasksFromIndex(index)
+			passed = passed and board.CanonicalIndex(index) == CanonicalIndex(index)
+			passed = passed and board.IndexBoard(board.BoardFromIndex(index)) == index
+			passed = passed and MnkPosition(board, index).winner == (
+					'X' if IsWinnerIndex(index, 'X') else 'O' if IsWinnerIndex(index, 'O') else None)
+
+	passed = passed and len(MnkBoard(4, 4, 4).lineMasks) == 10
+	passed = passed and len(MnkBoard(5, 5, 4).lineMasks) == 28
+	passed = passed and len(MnkBoard(3, 4, 3).squarePermutations) == 4
+
+	board = MnkBoard(4, 4, 4)
+	position = MnkPosition(board)
+	for square in (0, 4, 1, 5, 2, 6, 8):
+		position.Move(position.Mover(), square)
+	passed = passed and position.winner is None
+	position.Move('O', 7)
+	passed = passed and position.winner == 'O'
+
+	store = MnkMatchboxes(board)
+	players = {'X': store.PickSquare, 'O': store.PickSquare}
+	games = [PlayGame(players, MnkPosition(board)) for _ in range(200)]
+	LearnFromParsedGames(games, store)
+	passed = passed and store.gameCount == 200
+	for game in games:
+		passed = passed and game.winner in ('X', 'O', 'C') and len(game.moves) <= 16
+	for index in list(store.matchboxes)[:100]:
+		matchbox = store[index]
+		passed = passed and store.Total(index) == sum(matchbox) >= 1
+		passed = passed and all(count == 0 for square, count in enumerate(matchbox)
+				if not board.EmptyMask(index) & (1 << square))
+
+	if verbose or not passed:
+		print()
+		print('TestMnkBoard')
+		print(f'Matchboxes: {len(store)}')
+
+	if not passed:
+		print ('FAILED')
+		return False
+	else:
+		return True
+
 
 tests = (TestCondition(TestIsWinner, False),
 				 TestCondition(TestValidateMove, False),
@@ -826,12 +2139,37 @@ tests = (TestCondition(TestIsWinner, False),
 				 TestCondition(TestRotate, False),
 				 TestCondition(TestFlip, False),
 				 TestCondition(TestCanonicalize, False),
+				 TestCondition(TestSymmetryTables, False),
+				 TestCondition(TestPosition, False),
 				 TestCondition(TestBoardFromIndex, False),
+				 TestCondition(TestMasksFromBoard, False),
+				 TestCondition(TestStateTable, False),
 				 TestCondition(TestDefaultMatchbox, False),
+				 TestCondition(TestMatchboxStore, False),
 				 TestCondition(TestPickSquareAtRandom, False),
+				 TestCondition(TestPickSquare, False),
 				 TestCondition(TestGetComputerMove, False),
 				 TestCondition(TestParseGames, False),
-				 TestCondition(TestLearnFromGames, True)
+				 TestCondition(TestIterParseGames, False),
+				 TestCondition(TestLearnFromGames, True),
+				 TestCondition(TestSelfPlay, False),
+				 TestCondition(TestParallelSelfPlay, False),
+				 TestCondition(TestMatchboxSnapshot, False),
+				 TestCondition(TestCatchUpFromLog, False),
+				 TestCondition(TestSolver, False),
+				 TestCondition(TestCompareBenchmarks, False),
+				 TestCondition(TestInstrument, False),
+				 TestCondition(TestTrainWithEvaluation, False),
+				 TestCondition(TestGameServer, False),
+				 TestCondition(TestMnkBoard, False),
+				 TestCondition(TestLearnFromGameLines, False),
+				 TestCondition(TestLegalMoves, False),
+				 TestCondition(TestSweep, False),
+				 TestCondition(TestBatchSelfPlay, False),
+				 TestCondition(TestBinaryGameLog, False),
+				 TestCondition(TestCorpus, False),
+				 TestCondition(TestSharedMatchboxes, False),
+				 TestCondition(TestLockedMatchboxes, False)
 				 )
 
 def Test():